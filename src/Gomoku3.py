@@ -9,57 +9,613 @@ from board_util import (
     coord_to_point,
     WIN_CONDITION
 )
-from board import GoBoard
+import argparse
 import copy
+import math
 import random
+import time
 from gtp_connection import GtpConnection
+from evaluator import evaluate, threats
+
+"""
+Exploration constant of the UCB1 rule of tree_search, about sqrt(2)
+for win rates between 0 and 1.
+"""
+UCT_EXPLORATION=1.4
+
 class FlatMCSimPlayer:
     def __init__(self,numSimulations,board):
         self.numSimulations=numSimulations
         self.board=board
         self.name = "GomokuAssignment3"
         self.version = 1.0
+        #Optional RolloutScheduler shared with other searches in this process
+        self.scheduler=None
+        #Playouts per move between two early stopping checks
+        self.roundSize=1
+        #Error probability of the statistical early stopping test,
+        #None to stop only once the best move can no longer change
+        self.confidence=None
+        self.scores={}
+        #Total number of playouts run, read by the tracing layer
+        self.playouts=0
+        #Random number generator of the playouts; every search thread
+        #has its own
+        self.rng=random.Random()
+        #Number of threads used by startSimulation
+        self.threads=1
+        #All-moves-as-first statistics: None, "amaf" or "rave"
+        self.amaf=None
+        #Number of direct playouts at which RAVE gives the direct and
+        #the AMAF win rates about equal weight
+        self.raveEquivalence=100
+        #Rollout moves after which a playout is cut off and scored by
+        #evaluator.evaluate, None to play every playout to the end
+        self.rolloutDepth=None
+        #Seconds per startSimulation call, None for no limit; the search
+        #stops after the round in which the time runs out
+        self.timeLimit=None
+        #Optional tablebase.Tablebase of solved endgame positions, probed
+        #before searching and once in every playout that gets to its
+        #number of empty points
+        self.tablebase=None
+        #Optional node_store.NodeStore: with it, startSimulation runs a
+        #UCT tree search in it instead of the flat search (see tree_search)
+        self.tree=None
+        #Root node of the last tree search, the color it searched for and
+        #the board it searched, to find the subtree to keep
+        self.treeRoot=None
+        self.treeColor=None
+        self.treeStones=None
+
+    def seed(self,seed):
+        """
+        Restart the random number streams of the search from seed: the
+        playout generator and the attached scheduler's, if any. Thread
+        searches derive their generators from the playout generator.
+        """
+        self.rng=random.Random(seed)
+        if self.scheduler is not None:
+            self.scheduler.seed(seed)
 
     def startSimulation(self,board,board_color,policy="random"):
+        """
+        Flat Monte Carlo search: up to numSimulations playouts for every
+        legal move, in rounds of roundSize playouts per move.
+        One-ply forced moves and a single legal move are returned
+        without any search, and moves that can no longer become the best
+        one are dropped after each round. The search stops when a single move is left.
+        The win rate of each simulated move is kept in self.scores,
+        also for the moves dropped early.
+        With self.amaf set, every playout also updates the AMAF
+        statistics of all moves color played in it, and moves are
+        ranked by the AMAF or RAVE value (see rave_value) instead.
+        Early stopping is then off, as its bounds only hold for the
+        direct win rates.
+        With self.timeLimit set, the search also stops once that many
+        seconds have passed.
+        With self.threads>1, the playouts of each round are run by that
+        many threads (see simulate_candidates); everything else is the
+        same.
+        With self.tree set, the playouts are spent by a tree search
+        instead (see tree_search).
+        Returns the best move.
+        """
         self.board=board
         color = self.color_to_int(board_color)
+        self.scores={}
+        forced=self.forced_move(color)
+        if forced is not None:
+            return forced
+        solved=self.tablebase_move(color)
+        if solved is not None:
+            return solved
         legalMoves = GoBoardUtil.generate_legal_moves(self.board,color)
-        numLegalMoves=len(legalMoves)
+        if len(legalMoves)==0:
+            return PASS
+        if len(legalMoves)==1:
+            return legalMoves[0]
+        if self.numSimulations<1:
+            raise ValueError("numSimulations must be at least 1, not {}".format(
+                self.numSimulations))
+        if self.tree is not None:
+            return self.tree_search(legalMoves,color,policy)
+        wins=[0.0]*len(legalMoves)
+        visits=[0]*len(legalMoves)
+        workers=self.search_workers()
+        amafStats=[({},{}) for worker in workers]
+        candidates=list(range(len(legalMoves)))
+        played=0
+        if self.timeLimit is not None:
+            deadline=time.perf_counter()+self.timeLimit
+        while played<self.numSimulations and len(candidates)>1:
+            count=min(self.roundSize,self.numSimulations-played)
+            self.simulate_candidates(workers,legalMoves,candidates,color,count,policy,
+                                     wins,amafStats)
+            for i in candidates:
+                visits[i]+=count
+            played+=count
+            if self.amaf is None:
+                candidates=self.remaining_candidates(candidates,wins,played)
+            if self.timeLimit is not None and time.perf_counter()>=deadline:
+                break
+        amafWins,amafVisits=amafStats[0]
+        for workerWins,workerVisits in amafStats[1:]:
+            for move,visited in workerVisits.items():
+                amafWins[move]=amafWins.get(move,0.0)+workerWins[move]
+                amafVisits[move]=amafVisits.get(move,0)+visited
+        for worker in workers:
+            if worker is not self:
+                self.playouts+=worker.playouts
+        for i in range(len(legalMoves)):
+            if visits[i]>0:
+                move=legalMoves[i]
+                if self.amaf is None:
+                    self.scores[move]=wins[i]/visits[i]
+                else:
+                    self.scores[move]=self.rave_value(wins[i],visits[i],
+                                                      amafWins.get(move,0.0),
+                                                      amafVisits.get(move,0))
+        bestMove=max(candidates, key=lambda i: self.scores[legalMoves[i]])
+        return legalMoves[bestMove]
+
+    def tree_search(self,legalMoves,color,policy):
+        """
+        UCT search in the node store self.tree, with the playout budget
+        of the flat search: numSimulations playouts per legal move, or
+        fewer if self.timeLimit runs out. A node gets its children on
+        its second visit, if the store has room for all of them; once
+        it is full the tree stops growing and the playouts start from
+        its leaves.
+        The subtree of the current position is kept from the last
+        search (see tree_root). self.scores gets the win rates of the
+        root moves.
+        Returns the most visited root move.
+        """
+        from node_store import NULL
+        store=self.tree
+        root=self.tree_root(color)
+        if store.first_child[root]==NULL and not store.expand(root,legalMoves):
+            raise ValueError("a tree of {} nodes cannot hold the {} root moves".format(
+                store.capacity,len(legalMoves)))
+        if self.timeLimit is not None:
+            deadline=time.perf_counter()+self.timeLimit
+        for i in range(self.numSimulations*len(legalMoves)):
+            self.tree_playout(root,color,policy)
+            if self.timeLimit is not None and time.perf_counter()>=deadline:
+                break
+        for child in store.children(root):
+            if store.visits[child]>0:
+                self.scores[int(store.move[child])]= \
+                    float(store.wins[child])/int(store.visits[child])
+        return int(store.move[store.most_visited_child(root)])
+
+    def tree_root(self,color):
+        """
+        The root node of a tree search for color on self.board.
+        If the last tree search was for the same position, its root is
+        kept. If it was for color two moves back, and the board now has
+        the move of a root child of that search and a reply to it, the
+        subtree of that reply becomes the root, and the rest of the tree
+        goes back to the free list (NodeStore.promote).
+        Otherwise the tree is cleared.
+        """
+        from node_store import NULL
+        store=self.tree
+        stones=tuple(self.board.board)
+        root=self.treeRoot
+        if root is not None and color==self.treeColor and \
+           len(stones)==len(self.treeStones):
+            added={}
+            for point,(old,new) in enumerate(zip(self.treeStones,stones)):
+                if old!=new:
+                    if old!=EMPTY:
+                        added=None
+                        break
+                    added[new]=point
+            if added is not None and len(added)==2 and \
+               sorted(added)==sorted((color,GoBoardUtil.opponent(color))):
+                for mover in (color,GoBoardUtil.opponent(color)):
+                    child=store.find_child(root,added[mover])
+                    if child==NULL:
+                        root=None
+                        break
+                    root=store.promote(root,child)
+            elif added!={}:
+                root=None
+        else:
+            root=None
+        if root is None:
+            store.clear()
+            #the root has no move of its own; 0 is a border point
+            root=store.new_node(0)
+        self.treeRoot=root
+        self.treeColor=color
+        self.treeStones=stones
+        return root
+
+    def tree_playout(self,root,color,policy):
+        """
+        One UCT iteration below root, where color is to play: descend by
+        NodeStore.uct_child to a node without visits or a finished game,
+        adding the children of nodes visited before, run a playout from
+        there and back its result up the path.
+        """
+        from node_store import NULL
+        store=self.tree
+        node=root
+        path=[]
+        mover=color
+        while True:
+            node=store.uct_child(node,UCT_EXPLORATION)
+            move=int(store.move[node])
+            self.board.play_move(move,mover)
+            path.append(node)
+            result=self.board.get_result(mover,move,WIN_CONDITION)
+            if result!='unknown' or store.visits[node]==0:
+                break
+            if store.first_child[node]==NULL:
+                moves=GoBoardUtil.generate_legal_moves(self.board,
+                                                       GoBoardUtil.opponent(mover))
+                if store.available<len(moves):
+                    break
+                store.expand(node,moves)
+            mover=GoBoardUtil.opponent(mover)
+        result=self.playout(move,mover,policy)
+        for node in reversed(path):
+            self.board.undo_move(int(store.move[node]))
+        self.playouts+=1
+        store.visits[root]+=1
+        store.update(path,self.result_score(result,color))
+
+    def analyze(self,board,board_color,policy,interval,stop,report):
+        """
+        Open-ended search for analysis: rounds of roundSize playouts for
+        every legal move, with no playout limit and no pruning, until
+        stop() returns True. stop is checked before the playouts of each
+        move, so the search ends within one round of playouts of it.
+        Every interval seconds, report is called with the list of
+        (move, visits, win rate) of all moves, best first.
+        Returns the same list for the final state of the search.
+        """
+        self.board=board
+        color=self.color_to_int(board_color)
+        legalMoves=GoBoardUtil.generate_legal_moves(self.board,color)
+        wins=[0.0]*len(legalMoves)
+        visits=[0]*len(legalMoves)
+
+        def ranking():
+            ranked=[(move,visits[i],wins[i]/visits[i] if visits[i] else 0.0)
+                    for i,move in enumerate(legalMoves)]
+            ranked.sort(key=lambda entry:(entry[2],entry[1]),reverse=True)
+            return ranked
+
+        nextReport=time.perf_counter()+interval
+        while len(legalMoves)>0 and not stop():
+            for i,move in enumerate(legalMoves):
+                if stop():
+                    break
+                stats=self.simulate_round(move,color,self.roundSize,policy)
+                wins[i]+=self.stats_score(stats,color)
+                visits[i]+=self.roundSize
+                if time.perf_counter()>=nextReport:
+                    report(ranking())
+                    nextReport=time.perf_counter()+interval
+        return ranking()
+
+    def tablebase_move(self,color):
+        """
+        Return the best move for color by the exact values of the
+        tablebase, if every legal move ends the game or leads to a
+        position in it; self.scores gets 1, 0.5 or 0 per move.
+        Returns None otherwise.
+        """
+        if self.tablebase is None:
+            return None
+        legalMoves=GoBoardUtil.generate_legal_moves(self.board,color)
+        if len(legalMoves)==0 or len(legalMoves)>self.tablebase.max_empty+1:
+            return None
+        opponent=GoBoardUtil.opponent(color)
         scores={}
-        for i in range (len(legalMoves)):
-            move = legalMoves[i]
-            scores[i] = self.simulate(move,color,policy)
-        print(scores)
-        bestMove=max(scores, key=scores.get)
-        print(bestMove)
+        for move in legalMoves:
+            self.board.play_move(move,color)
+            result=self.board.get_result(color,move,WIN_CONDITION)
+            if result=='unknown':
+                value=self.tablebase.probe(self.board,opponent,len(legalMoves)-1)
+                score=None if value is None else (1-value)/2
+            else:
+                score=self.result_score(result,color)
+            self.board.undo_move(move)
+            if score is None:
+                return None
+            scores[move]=score
+        self.scores=scores
+        return max(legalMoves, key=lambda move: scores[move])
+
+    def forced_move(self,color):
+        """
+        Return the move forced for color: a winning move, or the only
+        move that blocks an opponent win.
+        The winning points are read from the open window counts (see
+        evaluator.threats), not from rules(): line_rule also reports
+        lines broken by the other color's stones as wins.
+        Returns None if there is a real choice.
+        """
+        wins=threats(self.board,color)[0]
+        if wins:
+            return min(wins)
+        blocks=threats(self.board,GoBoardUtil.opponent(color))[0]
+        if len(blocks)==1:
+            return blocks.pop()
+        return None
+
+    def remaining_candidates(self,candidates,wins,played):
+        """
+        Drop the candidates that cannot end up as the best move.
+        A move is dropped when even winning all its remaining playouts
+        would not lift it above the current leader. Ties go to the
+        lower index, as with max() over all moves.
+        If self.confidence is set, moves whose upper confidence bound
+        is below the leader's lower bound are dropped as well
+        (Hoeffding bounds, error probability self.confidence).
+        """
+        remaining=self.numSimulations-played
+        leader=max(candidates, key=lambda i: wins[i])
+        if self.confidence is not None and remaining>0:
+            margin=2*played*math.sqrt(math.log(2/self.confidence)/(2*played))
+        else:
+            margin=None
+        kept=[]
+        for i in candidates:
+            if i==leader:
+                kept.append(i)
+            elif wins[i]+remaining<wins[leader] or \
+                 (i>leader and wins[i]+remaining==wins[leader]):
+                continue
+            elif margin is not None and wins[i]+margin<wins[leader]:
+                continue
+            else:
+                kept.append(i)
+        return kept
+
+    def startParallelSimulation(self,board,board_color,numWorkers,policy="random",on_update=None):
+        """
+        Run the simulations for all legal moves in numWorkers processes.
+        The workers write their counts into a SharedStats block instead
+        of sending them back, and on_update, if given, is called with
+        that block about every 0.1 seconds so the current best move can
+        be read while the search runs.
+        Returns the best move.
+        """
+        import multiprocessing
+        from shared_stats import SharedStats, search_worker
+        self.board=board
+        color = self.color_to_int(board_color)
+        legalMoves = GoBoardUtil.generate_legal_moves(self.board,color)
+        if len(legalMoves)==0:
+            return PASS
+        stats=SharedStats(len(legalMoves),numWorkers)
+        playouts=-(-self.numSimulations//numWorkers)
+        workers=[]
+        for i in range(numWorkers):
+            workers.append(multiprocessing.Process(
+                target=search_worker,
+                args=(stats.name,numWorkers,i,self.board.copy(),legalMoves,
+                      color,playouts,policy,self.rng.getrandbits(32))))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(0.1)
+                if on_update is not None:
+                    on_update(stats)
+        bestMove=legalMoves[stats.best_move_index()]
+        self.playouts+=int(stats.totals()[0].sum())
+        stats.close()
         return bestMove
 
+    def search_workers(self):
+        """
+        The players that run the playouts of one search: [self], or with
+        self.threads>1 that many copies of self, each on its own copy of
+        the board with its own random number generator, seeded from
+        self.rng. The copies share the scheduler, rolloutDepth and
+        tablebase of self.
+        """
+        if self.threads<=1:
+            return [self]
+        workers=[]
+        for i in range(self.threads):
+            worker=FlatMCSimPlayer(self.numSimulations,self.board.copy())
+            worker.scheduler=self.scheduler
+            worker.rolloutDepth=self.rolloutDepth
+            worker.tablebase=self.tablebase
+            worker.rng=random.Random(self.rng.getrandbits(64))
+            workers.append(worker)
+        return workers
+
+    def simulate_candidates(self,workers,legalMoves,candidates,color,count,policy,
+                            wins,amafStats):
+        """
+        Run count playouts after each move legalMoves[i], i in candidates,
+        and add the score of color to wins[i]. The candidates are dealt
+        out to workers in turn; with several workers, each runs on its
+        own thread and only writes the wins of its own candidates, so the
+        threads take no locks. amafStats holds the (amafWins, amafVisits)
+        dicts of each worker for the AMAF statistics.
+        This scales across cores on free-threaded Python builds, and
+        with a scheduler attached lets the threads overlap with its
+        GIL-releasing numpy batches on standard builds.
+        """
+        def run(worker,indices,amafWins,amafVisits):
+            for i in indices:
+                if self.amaf is None:
+                    stats=worker.simulate_round(legalMoves[i],color,count,policy)
+                    wins[i]+=worker.stats_score(stats,color)
+                else:
+                    wins[i]+=worker.simulate_round_amaf(legalMoves[i],color,count,policy,
+                                                        amafWins,amafVisits)
+
+        if len(workers)==1:
+            run(workers[0],candidates,*amafStats[0])
+            return
+        import threading
+        errors=[]
+
+        def run_thread(*args):
+            try:
+                run(*args)
+            except Exception as e:
+                errors.append(e)
+
+        threads=[threading.Thread(target=run_thread,
+                                  args=(worker,candidates[k::len(workers)])+amafStats[k])
+                 for k,worker in enumerate(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
     def simulate(self,move,color,policy='random'):
+        stats=self.simulate_round(move,color,self.numSimulations,policy)
+        return self.stats_score(stats,color)/self.numSimulations
+
+    def simulate_round(self,move,color,count,policy='random'):
+        """
+        Play move for color, run count playouts from there and undo it.
+        Returns the stats dict {'black', 'white', 'draw'}.
+        """
         stats = {'black':0 , 'white':0, 'draw':0}
-        movesMade=[]
+        self.playouts+=count
         #Append move which will start the simulation
         self.board.play_move(move,color)
-        color=GoBoardUtil.opponent(color)
-        movesMade.append(move)
-        for i in range (self.numSimulations):
-            while self.board.get_result(color,move,5)=='unknown':
-                if policy=='random':
-                    move=GoBoardUtil.generate_random_move(self.board,color)
-                elif policy=='rule':
-                    move=self.rule_move(color)
-                self.board.play_move(move,color)
-                color=GoBoardUtil.opponent(color)
-                movesMade.append(move)
-            stats[self.board.get_result(color,move,5)]+=1
-            for moveMade in movesMade:
-                self.board.undo_move(moveMade)
+        if self.scheduler is not None and policy in ('random','rule') \
+           and self.rolloutDepth is None and self.tablebase is None \
+           and self.board.get_result(color,move,WIN_CONDITION)=='unknown':
+            stats=self.scheduler.rollout(self.board,GoBoardUtil.opponent(color),count,policy)
+        else:
+            for i in range (count):
+                result=self.playout(move,color,policy)
+                if isinstance(result,str):
+                    stats[result]+=1
+                else:
+                    stats['black']+=result
+                    stats['white']+=1-result
+        self.board.undo_move(move)
+        return stats
+
+    def simulate_round_amaf(self,move,color,count,policy,amafWins,amafVisits):
+        """
+        Like simulate_round, but the result of each playout is also
+        credited to every move color made in it, as if each had been
+        played first. amafWins and amafVisits map points to counts and
+        are updated in place.
+        Returns the total score of color over the count playouts.
+        """
+        total=0.0
+        self.playouts+=count
+        self.board.play_move(move,color)
+        for i in range(count):
             movesMade=[]
-        if self.board.current_player==BLACK:
-            eval=( ( stats['black'] + ( 0.5 * stats['draw'] ) ) / self.numSimulations )
-        elif self.board.current_player==WHITE:
-            eval=( ( stats['white'] + ( 0.5 * stats['draw'] ) ) / self.numSimulations )
-        return eval
+            result=self.playout(move,color,policy,movesMade)
+            score=self.result_score(result,color)
+            total+=score
+            #the opponent moves first in the playout
+            for amafMove in [move]+movesMade[1::2]:
+                amafWins[amafMove]=amafWins.get(amafMove,0.0)+score
+                amafVisits[amafMove]=amafVisits.get(amafMove,0)+1
+        self.board.undo_move(move)
+        return total
+
+    def rave_value(self,wins,visits,amafWins,amafVisits):
+        """
+        Value of a move from its direct and AMAF statistics.
+        With self.amaf=="amaf" this is the AMAF win rate. With "rave"
+        it is a blend that moves from the AMAF win rate towards the
+        direct one as visits grows:
+            beta = sqrt(k / (3 * visits + k)), k = self.raveEquivalence
+        """
+        if amafVisits==0:
+            return wins/visits
+        if self.amaf=="amaf":
+            return amafWins/amafVisits
+        beta=math.sqrt(self.raveEquivalence/(3*visits+self.raveEquivalence))
+        return (1-beta)*wins/visits+beta*amafWins/amafVisits
+
+    def result_score(self,result,color):
+        """
+        Score of a playout result for color: 1 win, 0.5 draw, 0 loss.
+        The estimated score of black from a cut off playout is converted
+        to the score of color.
+        """
+        if not isinstance(result,str):
+            return result if color==BLACK else 1-result
+        if result=='draw':
+            return 0.5
+        if (result=='black')==(color==BLACK):
+            return 1.0
+        return 0.0
+
+    def stats_score(self,stats,color):
+        """ Wins of color in stats, counting draws as half a win """
+        if color==BLACK:
+            return stats['black'] + ( 0.5 * stats['draw'] )
+        return stats['white'] + ( 0.5 * stats['draw'] )
+
+    def playout(self,move,color,policy='random',movesMade=None):
+        """
+        Play one rollout from the current position, in which color has
+        just played move. All rollout moves are undone again.
+        If movesMade is a list, the rollout moves are appended to it.
+        Returns the result: 'black', 'white' or 'draw'. With
+        self.rolloutDepth set, a playout still undecided after that many
+        moves is scored by the static evaluator instead, and the
+        estimated score of black (a float in [0, 1]) is returned.
+        With self.tablebase set, the first position of the playout with
+        at most its number of empty points is looked up, and a solved
+        position ends the playout with its exact result.
+        """
+        if movesMade is None:
+            movesMade=[]
+        depth=0
+        result=self.board.get_result(color,move,WIN_CONDITION)
+        empty=None
+        if self.tablebase is not None and result=='unknown':
+            empty=len(self.board.get_empty_points())
+        while result=='unknown':
+            color=GoBoardUtil.opponent(color)
+            if empty is not None and empty<=self.tablebase.max_empty:
+                value=self.tablebase.probe(self.board,color,empty)
+                empty=None
+                if value is not None:
+                    result=self.tablebase_result(value,color)
+                    break
+            if self.rolloutDepth is not None and depth>=self.rolloutDepth:
+                score=evaluate(self.board,color)
+                result=score if color==BLACK else 1-score
+                break
+            depth+=1
+            if policy=='random':
+                move=GoBoardUtil.generate_random_move(self.board,color,self.rng)
+            elif policy=='rule':
+                move=self.get_rule_move(color)
+            self.board.play_move(move,color)
+            movesMade.append(move)
+            if empty is not None:
+                empty-=1
+            result=self.board.get_result(color,move,WIN_CONDITION)
+        for moveMade in movesMade:
+            self.board.undo_move(moveMade)
+        return result
     
+    def tablebase_result(self,value,color):
+        """ Game result for a tablebase value of color to play """
+        if value==0:
+            return 'draw'
+        return 'black' if (value==1)==(color==BLACK) else 'white'
+
     def color_to_int(self,c):
         """convert character to the appropriate integer code"""
         color_to_int = {"b": BLACK, "w": WHITE, "e": EMPTY, "BORDER": BORDER}
@@ -70,12 +626,28 @@ class FlatMCSimPlayer:
 
     def get_rule_move(self, color):
         moves = list(self.rules(color).values())[0]
-        random.shuffle(moves)
+        self.rng.shuffle(moves)
         if len(moves) == 0:
             return "draw"
         return moves[0]
 
     def rules(self, color):
+        """
+        The moves of the first non-empty rule bucket of rule_buckets,
+        as {rule name: moves}, or "pass" if there are no empty points.
+        """
+        for rule, moves in self.rule_buckets(color):
+            if len(moves) > 0:
+                return {rule:moves}
+        return "pass"
+
+    def rule_buckets(self, color):
+        """
+        Sort every empty point into the bucket of the best rule it
+        satisfies for color on any line through it. Returns the list of
+        (rule name, moves) pairs in priority order: Win, BlockWin,
+        OpenFour, BlockOpenFour, Random.
+        """
         win = []
         block = []
         open_four = []
@@ -110,17 +682,8 @@ class FlatMCSimPlayer:
             else:
                 random.append(move)
 
-        if len(win) > 0:
-            return {"Win":win}
-        if len(block) > 0:
-            return {"BlockWin":block}
-        if len(open_four) > 0:
-            return {"OpenFour":open_four}
-        if len(block_open_four):
-            return {"BlockOpenFour":block_open_four}
-        if len(random) > 0:
-            return {"Random":random}
-        return "pass"
+        return [("Win", win), ("BlockWin", block), ("OpenFour", open_four),
+                ("BlockOpenFour", block_open_four), ("Random", random)]
 
     def line_rule(self, color, pos, two_directions):
         stats = {"win":False, "block_win":False, "open_four":False, "block_open_four":False}
@@ -240,8 +803,72 @@ def run():
     """
     start the gtp connection and wait for commands.
     """
+    parser = argparse.ArgumentParser(description="Gomoku GTP engine")
+    parser.add_argument("--board", choices=["numpy", "compact"], default="numpy",
+                        help="board backend; compact does not import numpy")
+    parser.add_argument("--trace", action="store_true",
+                        help="time every command, see the trace_stats command")
+    parser.add_argument("--trace-log", metavar="FILE",
+                        help="also write a JSON line per command to FILE")
+    parser.add_argument("--search", action="store_true",
+                        help="genmove searches with flat Monte Carlo "
+                             "playouts instead of playing the rule policy's move")
+    parser.add_argument("--amaf", choices=["amaf", "rave"],
+                        help="credit every playout to all moves played in it")
+    parser.add_argument("--threads", type=int,
+                        help="search threads, each with its own board copy")
+    parser.add_argument("--rollout-depth", type=int,
+                        help="cut playouts off after this many moves and "
+                             "score them with the static evaluator")
+    parser.add_argument("--tree-nodes", type=int, metavar="N",
+                        help="search a UCT tree of at most N nodes instead "
+                             "of the flat Monte Carlo search (uses numpy)")
+    parser.add_argument("--tablebase", metavar="FILE",
+                        help="endgame tablebase written by tablebase.py")
+    parser.add_argument("--config", metavar="FILE",
+                        help="engine config written by autotune.py, used "
+                             "with --search and by analyze; the options "
+                             "above override it")
+    parser.add_argument("--time", type=float,
+                        help="seconds per move to pick the config for")
+    parser.add_argument("--record", metavar="FILE",
+                        help="write every command and search seed to FILE "
+                             "for replay.py")
+    args = parser.parse_args()
+    if args.board == "compact":
+        from compact_board import CompactGoBoard as GoBoard
+    else:
+        from board import GoBoard
+    tracer = None
+    if args.trace or args.trace_log:
+        from gtp_trace import CommandTracer
+        tracer = CommandTracer(open(args.trace_log, "a") if args.trace_log else None)
     board = GoBoard(7)
-    con = GtpConnection(FlatMCSimPlayer(10,board), board)
+    player = FlatMCSimPlayer(10,board)
+    overrides = {"amaf": args.amaf, "threads": args.threads,
+                 "rolloutDepth": args.rollout_depth, "treeNodes": args.tree_nodes}
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+    if args.tablebase:
+        from tablebase import Tablebase
+        player.tablebase = Tablebase(args.tablebase)
+    con = GtpConnection(player, board, tracer=tracer)
+    con.search = args.search
+    if args.config:
+        from autotune import TunedConfigs, read_configs
+        con.tuned = TunedConfigs(read_configs(args.config), args.time, overrides)
+        con.apply_tuned_config()
+    else:
+        from selfplay import apply_config
+        apply_config(player, overrides)
+    if args.record:
+        from replay import Recorder
+        from selfplay import player_config
+        con.recorder = Recorder(open(args.record, "w"), {
+            "board": args.board, "size": board.size,
+            "config": player_config(player), "policy": con.policy,
+            "search": con.search,
+            "tuned": con.tuned.settings() if con.tuned else None,
+            "tablebase": args.tablebase})
     con.start_connection()
 if __name__ == "__main__":
     run()
\ No newline at end of file
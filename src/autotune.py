@@ -0,0 +1,208 @@
+"""
+autotune.py
+
+Choose the engine configuration for a board size and a time per move.
+
+For every candidate combination of rollout policy, search threads and
+rollout batch size (see selfplay.py for the config keys), the tuner
+measures playouts per second on this machine from a few random
+mid-game positions. It sets numSimulations so that a search over the
+legal moves of an average position fits the time per move, with
+timeLimit as a hard cap. Each candidate then plays a short match
+against the first one, and the candidate with the best score, then the
+highest playout rate, is written to the config file under its board
+size and time per move. Gomoku3.py --search loads it with --config
+and applies the config of the current board size on every boardsize.
+
+Config file format (JSON):
+    {"version": 1, "configs": {"7": {"0.5": {...engine config...}}}}
+
+Usage:
+    python autotune.py --size 7 --time 0.5 [--games 4] [--out tuned.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from board_util import GoBoardUtil, BLACK, WIN_CONDITION
+from selfplay import make_player, match
+
+CONFIG_VERSION = 1
+
+"""
+Playouts per legal move when measuring playout rates.
+"""
+MEASURE_PLAYOUTS = 5
+
+
+def random_positions(size, count, rng):
+    """ Lists of moves leading to count random positions a quarter full """
+    from board import GoBoard
+    board = GoBoard(size)
+    positions = []
+    while len(positions) < count:
+        moves = []
+        color = BLACK
+        for i in range(size * size // 4):
+            move = GoBoardUtil.generate_random_move(board, color, rng)
+            board.play_move(move, color)
+            moves.append(move)
+            if board.get_result(color, move, WIN_CONDITION) != "unknown":
+                break
+            color = GoBoardUtil.opponent(color)
+        else:
+            positions.append(moves)
+        for move in moves:
+            board.undo_move(move)
+    return positions
+
+
+def measure_rate(config, size, positions, playouts_per_move=MEASURE_PLAYOUTS):
+    """ Playouts per second of config, searching each of positions """
+    from board import GoBoard
+    config = dict(config, numSimulations=playouts_per_move, timeLimit=None)
+    playouts = 0
+    elapsed = 0.0
+    for moves in positions:
+        board = GoBoard(size)
+        color = BLACK
+        for move in moves:
+            board.play_move(move, color)
+            color = GoBoardUtil.opponent(color)
+        player = make_player(config, board, 0)
+        start = time.perf_counter()
+        player.startSimulation(board, "b" if color == BLACK else "w",
+                               config.get("policy", "random"))
+        elapsed += time.perf_counter() - start
+        playouts += player.playouts
+    return playouts / elapsed if elapsed else 0.0
+
+
+def candidates():
+    """ Candidate configs without numSimulations and timeLimit """
+    threads = sorted({1, 2, os.cpu_count() or 1})
+    batch_sizes = [None]
+    try:
+        import numpy
+        batch_sizes += [256, 1024]
+    except ImportError:
+        pass
+    configs = []
+    for policy in ("random", "rule"):
+        for thread_count in threads:
+            for batch_size in batch_sizes:
+                config = {"policy": policy, "threads": thread_count}
+                if batch_size is not None:
+                    config["batchSize"] = batch_size
+                configs.append(config)
+    return configs
+
+
+def tune(size, seconds, games=4, seed=0, log=print):
+    """
+    Return the best engine config for size and seconds per move.
+    Each candidate plays games games against the first candidate.
+    """
+    rng = random.Random(seed)
+    positions = random_positions(size, 3, rng)
+    average_moves = size * size * 3 // 4
+    tuned = []
+    for config in candidates():
+        rate = measure_rate(config, size, positions)
+        config = dict(config, timeLimit=seconds,
+                      numSimulations=max(1, int(rate * seconds / average_moves)))
+        tuned.append((config, rate))
+    reference = tuned[0][0]
+    best = None
+    for config, rate in tuned:
+        score = games / 2.0
+        if config is not reference:
+            score = match(games, size, config, reference, seed)[0]
+        log("{:6.0f} playouts/s  {:4.1f}/{}  {}".format(rate, score, games,
+                                                        json.dumps(config)))
+        if best is None or (score, rate) > best[:2]:
+            best = (score, rate, config)
+    return best[2]
+
+
+def read_configs(path):
+    """ The "configs" dict of the config file path """
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") != CONFIG_VERSION:
+        raise ValueError("{} is not a version {} config file".format(path, CONFIG_VERSION))
+    return data["configs"]
+
+
+def pick_config(configs, size, seconds=None):
+    """
+    The config in configs for board size size and the time per move
+    closest to seconds (the longest one if seconds is None), or None if
+    there is none for size.
+    """
+    budgets = configs.get(str(size))
+    if not budgets:
+        return None
+    if seconds is None:
+        key = max(budgets, key=float)
+    else:
+        key = min(budgets, key=lambda budget: abs(float(budget) - seconds))
+    return budgets[key]
+
+
+class TunedConfigs(object):
+    """
+    The tuned configs of a config file, looked up per board size.
+    overrides are config keys that replace the tuned values, e.g. the
+    ones given on the command line.
+    """
+    def __init__(self, configs, seconds=None, overrides=None):
+        self.configs = configs
+        self.seconds = seconds
+        self.overrides = dict(overrides or {})
+
+    def config(self, size):
+        """
+        The engine config for board size size: the tuned one, or the
+        defaults if size was not tuned, updated with the overrides.
+        """
+        config = dict(pick_config(self.configs, size, self.seconds) or {})
+        config.update(self.overrides)
+        return config
+
+    def settings(self):
+        """ The arguments to rebuild this object, as a JSON-ready dict """
+        return {"configs": self.configs, "seconds": self.seconds,
+                "overrides": self.overrides}
+
+
+def save_config(path, size, seconds, config):
+    """ Add or replace the config for size and seconds in path """
+    data = {"version": CONFIG_VERSION, "configs": {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    data["configs"].setdefault(str(size), {})[str(seconds)] = config
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the engine configuration")
+    parser.add_argument("--size", type=int, default=7)
+    parser.add_argument("--time", type=float, default=1.0,
+                        help="seconds per move to tune for")
+    parser.add_argument("--games", type=int, default=4,
+                        help="games per candidate against the reference")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="tuned.json")
+    args = parser.parse_args()
+    config = tune(args.size, args.time, args.games, args.seed)
+    save_config(args.out, args.size, args.time, config)
+    print("best: {}".format(json.dumps(config)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+batch_analysis.py
+
+Offline analysis of many positions without a GTP process per position.
+
+Reads positions as JSON lines from a file or stdin, analyses them in a
+process pool with FlatMCSimPlayer and writes one JSON line per position,
+in input order, as soon as it is ready. At most a fixed number of
+positions are in flight, so memory use does not grow with the input.
+
+Input line fields:
+    size      board size (default 7)
+    moves     list of moves, either "b d4" or just "d4"; moves without
+              a color alternate starting with black
+    board     alternatively, the board as rows from the top row down,
+              separated by newlines or "/", with X black, O white, . empty
+    to_play   "b" or "w" (default: black if both have the same number
+              of stones, white otherwise)
+    id        optional, copied to the output
+
+Output line fields: id, best, scores (win rate per simulated move),
+rules (the rule bucket from rules()), time (seconds), or error.
+
+Usage: python batch_analysis.py [INPUT] [-o OUTPUT] [--workers N]
+           [--simulations N] [--policy {random,rule}]
+"""
+
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from board_util import BLACK, WHITE, GoBoardUtil
+from gtp_connection import point_tables, color_to_int
+
+"""
+Stone characters of the board field; "." is an empty point.
+"""
+STONES = {"X": BLACK, "O": WHITE}
+
+
+def setup_position(position, board_class):
+    """
+    Build a board for the position dict.
+    Returns (board, color to play).
+    """
+    board = board_class(position.get("size", 7))
+    str_to_point = point_tables(board.size)[1]
+    color = BLACK
+    if "board" in position:
+        rows = position["board"].replace("/", "\n").split()
+        if len(rows) != board.size:
+            raise ValueError("board has {} rows, expected {}".format(len(rows), board.size))
+        for i, row in enumerate(rows):
+            if len(row) != board.size:
+                raise ValueError("board row {!r} has {} points, expected {}".format(
+                    row, len(row), board.size))
+            start = board.row_start(board.size - i)
+            for j, c in enumerate(row):
+                if c == ".":
+                    continue
+                if c.upper() not in STONES:
+                    raise ValueError("bad board character {!r}, expected X, O or .".format(c))
+                board.play_move(start + j, STONES[c.upper()])
+    for entry in position.get("moves", []):
+        parts = entry.lower().split()
+        if len(parts) == 2:
+            color = color_to_int(parts[0])
+        move = str_to_point[parts[-1]]
+        if not board.play_move(move, color):
+            raise ValueError("illegal move: {}".format(entry))
+        color = GoBoardUtil.opponent(color)
+    if "to_play" in position:
+        color = color_to_int(position["to_play"].lower())
+    elif "board" in position:
+        empty = len(board.get_empty_points())
+        stones = board.size * board.size - empty
+        color = BLACK if stones % 2 == 0 else WHITE
+    board.current_player = color
+    return board, color
+
+
+def analyse_position(line, simulations, policy, backend):
+    """
+    Analyse one input line and return the output dict.
+    Runs in the worker processes.
+    """
+    from Gomoku3 import FlatMCSimPlayer
+    if backend == "compact":
+        from compact_board import CompactGoBoard as board_class
+    else:
+        from board import GoBoard as board_class
+    start = time.perf_counter()
+    try:
+        position = json.loads(line)
+    except ValueError as e:
+        return {"error": "bad json: {}".format(e)}
+    result = {"id": position.get("id")}
+    try:
+        board, color = setup_position(position, board_class)
+        point_to_str = point_tables(board.size)[0]
+        player = FlatMCSimPlayer(simulations, board)
+        rules = player.rules(color)
+        best = player.startSimulation(board, "b" if color == BLACK else "w", policy)
+        result["best"] = point_to_str[best].lower()
+        result["scores"] = {point_to_str[move].lower(): round(score, 4)
+                            for move, score in player.scores.items()}
+        if rules == "pass":
+            result["rules"] = {}
+        else:
+            result["rules"] = {rule: [point_to_str[move].lower() for move in moves]
+                               for rule, moves in rules.items()}
+    except Exception as e:
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+    result["time"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def analyse_stream(lines, workers, simulations, policy, backend, window=None):
+    """
+    Yield the analysis of each non-blank line of lines, in input order.
+    At most window positions (default 4 per worker) are submitted
+    but not yet yielded at any time.
+    """
+    window = window or 4 * workers
+    pending = collections.deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for line in lines:
+            if not line.strip():
+                continue
+            pending.append(pool.submit(analyse_position, line, simulations,
+                                       policy, backend))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch position analysis over JSON lines")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="JSON lines file, - for stdin")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file, - for stdout")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--simulations", type=int, default=10,
+                        help="playouts per move")
+    parser.add_argument("--policy", choices=["random", "rule"], default="random")
+    parser.add_argument("--board", choices=["numpy", "compact"], default="numpy")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    infile = sys.stdin if args.input == "-" else open(args.input)
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w")
+    for result in analyse_stream(infile, workers, args.simulations,
+                                 args.policy, args.board):
+        outfile.write(json.dumps(result) + "\n")
+        outfile.flush()
+
+
+if __name__ == "__main__":
+    main()
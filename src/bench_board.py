@@ -0,0 +1,91 @@
+"""
+bench_board.py
+
+Compare the numpy GoBoard and the bytearray CompactGoBoard:
+- per-move cost of play_move + get_result + undo_move in random playouts
+- process startup time of importing each board and of starting the engine
+
+Usage: python bench_board.py [--size N] [--playouts N]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+import random
+from board_util import GoBoardUtil, BLACK, WIN_CONDITION
+
+
+def per_move_cost(board_class, size, playouts):
+    """
+    Play random playouts on an empty board and return the average time
+    in microseconds per play_move + get_result (+ undo_move).
+    """
+    board = board_class(size)
+    random.seed(0)
+    moves_played = 0
+    start = time.perf_counter()
+    for i in range(playouts):
+        color = BLACK
+        moves_made = []
+        result = "unknown"
+        while result == "unknown":
+            move = GoBoardUtil.generate_random_move(board, color)
+            board.play_move(move, color)
+            moves_made.append(move)
+            result = board.get_result(color, move, WIN_CONDITION)
+            color = GoBoardUtil.opponent(color)
+        for move in moves_made:
+            board.undo_move(move)
+        moves_played += len(moves_made)
+    elapsed = time.perf_counter() - start
+    return 1e6 * elapsed / moves_played
+
+
+def startup_time(code, repeat=5):
+    """ Best wall time in ms of running python -c code in a new process """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return 1e3 * best
+
+
+def engine_startup_time(backend, repeat=5):
+    """ Best wall time in ms of starting the engine and sending quit """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "Gomoku3.py", "--board", backend],
+                       input=b"quit\n", stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return 1e3 * best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--size", type=int, default=7)
+    parser.add_argument("--playouts", type=int, default=200)
+    args = parser.parse_args()
+
+    from board import GoBoard
+    from compact_board import CompactGoBoard
+    print("per move (play_move + get_result), {0}x{0}:".format(args.size))
+    for name, board_class in (("numpy", GoBoard), ("compact", CompactGoBoard)):
+        cost = per_move_cost(board_class, args.size, args.playouts)
+        print("  {:8s} {:8.2f} us".format(name, cost))
+
+    print("startup:")
+    print("  {:8s} {:8.1f} ms".format("python", startup_time("pass")))
+    print("  {:8s} {:8.1f} ms".format("numpy", startup_time("import board")))
+    print("  {:8s} {:8.1f} ms".format("compact", startup_time("import compact_board")))
+    print("engine startup (Gomoku3.py):")
+    for backend in ("numpy", "compact"):
+        print("  {:8s} {:8.1f} ms".format(backend, engine_startup_time(backend)))
+
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,10 @@ from board_util import (
     coord_to_point,
     where1d,
     MAXSIZE,
-    GO_POINT
+    GO_POINT,
+    WIN_CONDITION,
+    get_windows,
+    get_increments
 )
 
 """
@@ -40,14 +43,17 @@ class GoBoard(object):
         Creates a Go board of given size
         """
         assert 2 <= size <= MAXSIZE
+        # number of changes to the board, see reset
+        self.changes = 0
         self.reset(size)
-        self.increments = {"N":-self.size-1, "NW":-self.size-2, "W":-1, "SW":self.size, 
-                           "S":self.size+1, "SE":self.size+2, "E":1, "NE":-self.size}
 
     def reset(self, size):
         """
         Creates a start state, an empty board with given size.
+        self.changes goes up on every reset, play_move and undo_move and
+        never down, so an unchanged value means an unchanged position.
         """
+        self.changes += 1
         self.size = size
         self.NS = size + 1
         self.WE = 1
@@ -57,8 +63,22 @@ class GoBoard(object):
         self.maxpoint = size * size + 3 * (size + 1)
         self.board = np.full(self.maxpoint, BORDER, dtype=GO_POINT)
         self._initialize_empty_points(self.board)
-        self.increments = {"N":-self.size-1, "NW":-self.size-2, "W":-1, "SW":self.size, 
-                           "S":self.size+1, "SE":self.size+2, "E":1, "NE":-self.size}
+        self.increments = get_increments(size)
+        self._initialize_windows()
+
+    def _initialize_windows(self):
+        """
+        Set up the open window counts for an empty board.
+        A window is a line of WIN_CONDITION points (see
+        board_util.get_windows); it is open for a color as long as it
+        holds no stone of the opponent.
+        window_stones[color][w] counts the stones of color in window w,
+        open_windows[color] counts the windows still open for color.
+        """
+        self.windows, self.point_windows = get_windows(self.size)
+        num_windows = len(self.windows)
+        self.window_stones = [None, [0] * num_windows, [0] * num_windows]
+        self.open_windows = [0, num_windows, num_windows]
 
     def copy(self):
         b = GoBoard(self.size)
@@ -68,6 +88,8 @@ class GoBoard(object):
         b.last2_move = self.last2_move
         b.current_player = self.current_player
         b.board = np.copy(self.board)
+        b.window_stones = [None, self.window_stones[BLACK][:], self.window_stones[WHITE][:]]
+        b.open_windows = self.open_windows[:]
         return b
 
     def get_color(self, point):
@@ -210,21 +232,51 @@ class GoBoard(object):
         # Special cases
         if point == PASS:
             return True
-        elif (self.get_empty_points().size == 0) or (self.board[point] != EMPTY):
+        elif (len(self.get_empty_points()) == 0) or (self.board[point] != EMPTY):
             return False  
 
         self.board[point] = color
+        self._update_windows(point, color, 1)
+        self.changes += 1
         return True
     
     def undo_move(self,point):
         '''
         Un - does move
         '''
-        if self.board[point] == EMPTY:
+        color = self.board[point]
+        if color == EMPTY:
             return False
         self.board[point]=EMPTY
+        self._update_windows(point, color, -1)
+        self.changes += 1
         return True
 
+    def _update_windows(self, point, color, delta):
+        """
+        Add delta stones of color on point to the window counts.
+        A window through point closes for the opponent when it gets
+        its first stone of color, and opens again when it loses it.
+        """
+        stones = self.window_stones[color]
+        opponent = GoBoardUtil.opponent(color)
+        for w in self.point_windows[point]:
+            if delta > 0:
+                if stones[w] == 0:
+                    self.open_windows[opponent] -= 1
+                stones[w] += 1
+            else:
+                stones[w] -= 1
+                if stones[w] == 0:
+                    self.open_windows[opponent] += 1
+
+    def is_dead_draw(self):
+        """
+        True if neither color has an open window left, so that nobody
+        can get WIN_CONDITION in a row any more and the game is a draw.
+        """
+        return self.open_windows[BLACK] == 0 and self.open_windows[WHITE] == 0
+
     def neighbors_of_color(self, point, color):
         """ List of neighbors of point of given color """
         nbc = []
@@ -272,7 +324,9 @@ class GoBoard(object):
                 else:
                     return "white"
 
-        if self.get_empty_points().size == 0:
+        if len(self.get_empty_points()) == 0:
+            return "draw"
+        if win_condition == WIN_CONDITION and self.is_dead_draw():
             return "draw"
         return "unknown"
 
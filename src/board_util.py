@@ -3,7 +3,6 @@ board_util.py
 Utility functions for Go board.
 """
 
-import numpy as np
 import random
 
 """
@@ -27,8 +26,17 @@ def is_black_white_empty(color):
 """
 A GO_POINT is a point on a Go board.
 It is encoded as a 32-bit integer, using the numpy type.
+GO_POINT is resolved lazily by __getattr__ below, so that importing
+this module does not import numpy (see compact_board.py).
 """
-GO_POINT = np.int32
+
+
+def __getattr__(name):
+    if name == "GO_POINT":
+        import numpy as np
+        return np.int32
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
 
 """
 Encoding of special pass move
@@ -60,6 +68,7 @@ Length of streak to win
 WIN_CONDITION = 5
 
 def where1d(condition):
+    import numpy as np
     return np.where(condition)[0]
 
 
@@ -111,6 +120,48 @@ def coord_to_point(row, col, boardsize):
     return NS * row + col
 
 
+_windows = {}
+_increments = {}
+
+
+def get_windows(boardsize):
+    """
+    Return (windows, point_windows) for boards of size boardsize.
+
+    windows is a list of tuples of the WIN_CONDITION points of every
+    straight line segment on which a win can be made.
+    point_windows is a list indexed by point; entry p is the list of
+    indices of all windows through p (empty for BORDER points).
+    The tables are read from table_cache once per board size.
+    """
+    tables = _windows.get(boardsize)
+    if tables is None:
+        from table_cache import get_table
+        points = get_table(boardsize, "windows")
+        offsets = get_table(boardsize, "window_offsets")
+        indices = get_table(boardsize, "window_indices")
+        windows = [tuple(points[i:i + WIN_CONDITION])
+                   for i in range(0, len(points), WIN_CONDITION)]
+        point_windows = [indices[offsets[p]:offsets[p + 1]].tolist()
+                         for p in range(len(offsets) - 1)]
+        tables = (windows, point_windows)
+        _windows[boardsize] = tables
+    return tables
+
+
+def get_increments(boardsize):
+    """
+    The dict of point increments of the 8 directions ("N", "NW", ...)
+    for boards of size boardsize, shared by all boards of that size.
+    """
+    increments = _increments.get(boardsize)
+    if increments is None:
+        from table_cache import get_table, DIRECTIONS
+        increments = dict(zip(DIRECTIONS, get_table(boardsize, "increments")))
+        _increments[boardsize] = increments
+    return increments
+
+
 class GoBoardUtil(object):
     @staticmethod
     def generate_legal_moves(board, color):
@@ -129,7 +180,7 @@ class GoBoardUtil(object):
 
 
     @staticmethod
-    def generate_random_move(board, color):
+    def generate_random_move(board, color, rng=None):
         """
         Generate a random move.
         Return PASS if no move found
@@ -140,11 +191,15 @@ class GoBoardUtil(object):
             a 1-d array representing the board
         color : BLACK, WHITE
             the color to generate the move for.
+        rng : random.Random
+            the random number generator to use, the random module if None.
         """
         moves = board.get_empty_points()
-        np.random.shuffle(moves)
-        for move in moves:
-            return move
+        if len(moves) == 0:
+            return PASS
+        if rng is None:
+            rng = random
+        return moves[rng.randrange(len(moves))]
 
     # @staticmethod
     # def generate_random_moves(board, use_eye_filter):
@@ -174,8 +229,9 @@ class GoBoardUtil(object):
         Does not pad with BORDER
         Rows 1..size of goboard are copied into rows 0..size - 1 of board2d
         """
+        import numpy as np
         size = goboard.size
-        board2d = np.zeros((size, size), dtype=GO_POINT)
+        board2d = np.zeros((size, size), dtype=np.int32)
         for row in range(size):
             start = goboard.row_start(row + 1)
             board2d[row, :] = goboard.board[start : start + size]
@@ -0,0 +1,245 @@
+"""
+compact_board.py
+
+A GoBoard variant that stores the board in a bytearray instead of a
+numpy array. It has the same API and the same 1-dimensional padded
+point encoding as GoBoard (see board.py and board_util.coord_to_point),
+but never imports numpy: scalar reads and writes in the playout loops
+(check_direction, line_rule, play_move) index a plain bytearray, and
+engine startup does not pay for the numpy import.
+"""
+
+from array import array
+from board_util import (
+    GoBoardUtil,
+    BLACK,
+    WHITE,
+    EMPTY,
+    BORDER,
+    PASS,
+    is_black_white,
+    coord_to_point,
+    MAXSIZE,
+    WIN_CONDITION,
+    get_windows,
+    get_increments
+)
+
+
+class CompactGoBoard(object):
+    def __init__(self, size):
+        """
+        Creates a Go board of given size
+        """
+        assert 2 <= size <= MAXSIZE
+        # number of changes to the board, see reset
+        self.changes = 0
+        self.reset(size)
+
+    def reset(self, size):
+        """
+        Creates a start state, an empty board with given size.
+        self.changes goes up on every reset, play_move and undo_move and
+        never down, so an unchanged value means an unchanged position.
+        """
+        self.changes += 1
+        self.size = size
+        self.NS = size + 1
+        self.WE = 1
+        self.last_move = None
+        self.last2_move = None
+        self.current_player = BLACK
+        self.maxpoint = size * size + 3 * (size + 1)
+        self.board = bytearray([BORDER]) * self.maxpoint
+        self._initialize_empty_points(self.board)
+        self.num_empty = size * size
+        self.increments = get_increments(size)
+        self._initialize_windows()
+
+    def _initialize_windows(self):
+        """
+        Set up the open window counts for an empty board,
+        as in GoBoard._initialize_windows.
+        """
+        self.windows, self.point_windows = get_windows(self.size)
+        num_windows = len(self.windows)
+        self.window_stones = [None, [0] * num_windows, [0] * num_windows]
+        self.open_windows = [0, num_windows, num_windows]
+
+    def copy(self):
+        b = CompactGoBoard(self.size)
+        assert b.NS == self.NS
+        assert b.WE == self.WE
+        b.last_move = self.last_move
+        b.last2_move = self.last2_move
+        b.current_player = self.current_player
+        b.board = bytearray(self.board)
+        b.num_empty = self.num_empty
+        b.window_stones = [None, self.window_stones[BLACK][:], self.window_stones[WHITE][:]]
+        b.open_windows = self.open_windows[:]
+        return b
+
+    def get_color(self, point):
+        return self.board[point]
+
+    def pt(self, row, col):
+        return coord_to_point(row, col, self.size)
+
+    def coord(self, pt):
+        pt = pt - ((pt-1)//(self.size+1)) - (self.size+1)
+
+        return chr(ord("A")+(pt%self.size))+str((pt//self.size)+1)
+
+    def is_legal(self, point, color):
+        """
+        Check whether it is legal for color to play on point.
+        Same answer as GoBoard.is_legal, without copying the board.
+        """
+        assert is_black_white(color)
+        if point == PASS:
+            return True
+        return self.num_empty > 0 and self.board[point] == EMPTY
+
+    def get_empty_points(self):
+        """
+        Return:
+            The empty points on the board, as an array('i').
+            Like the numpy array returned by GoBoard, it supports
+            len, iteration, indexing and tolist.
+        """
+        board = self.board
+        return array("i", [p for p in range(self.maxpoint) if board[p] == EMPTY])
+
+    def row_start(self, row):
+        assert row >= 1
+        assert row <= self.size
+        return row * self.NS + 1
+
+    def _initialize_empty_points(self, board):
+        """
+        Fills points on the board with EMPTY
+        Argument
+        ---------
+        board: bytearray, filled with BORDER
+        """
+        for row in range(1, self.size + 1):
+            start = self.row_start(row)
+            board[start : start + self.size] = bytes(self.size)
+
+    def get_size(self):
+        return self.size
+
+    def play_move(self, point, color):
+        """
+        Play a move of color on point
+        Returns boolean: whether move was legal
+        """
+        assert is_black_white(color)
+        # Special cases
+        if point == PASS:
+            return True
+        elif (self.num_empty == 0) or (self.board[point] != EMPTY):
+            return False
+
+        self.board[point] = color
+        self.num_empty -= 1
+        self._update_windows(point, color, 1)
+        self.changes += 1
+        return True
+
+    def undo_move(self, point):
+        '''
+        Un - does move
+        '''
+        color = self.board[point]
+        if color == EMPTY:
+            return False
+        self.board[point] = EMPTY
+        self.num_empty += 1
+        self._update_windows(point, color, -1)
+        self.changes += 1
+        return True
+
+    def _update_windows(self, point, color, delta):
+        """
+        Add delta stones of color on point to the window counts,
+        as in GoBoard._update_windows.
+        """
+        stones = self.window_stones[color]
+        opponent = GoBoardUtil.opponent(color)
+        for w in self.point_windows[point]:
+            if delta > 0:
+                if stones[w] == 0:
+                    self.open_windows[opponent] -= 1
+                stones[w] += 1
+            else:
+                stones[w] -= 1
+                if stones[w] == 0:
+                    self.open_windows[opponent] += 1
+
+    def is_dead_draw(self):
+        """
+        True if neither color has an open window left,
+        so the game can only end in a draw.
+        """
+        return self.open_windows[BLACK] == 0 and self.open_windows[WHITE] == 0
+
+    def neighbors_of_color(self, point, color):
+        """ List of neighbors of point of given color """
+        nbc = []
+        for nb in self._neighbors(point):
+            if self.get_color(nb) == color:
+                nbc.append(nb)
+        return nbc
+
+    def _neighbors(self, point):
+        """ List of all four neighbors of the point """
+        return [point - 1, point + 1, point - self.NS, point + self.NS]
+
+    def _diag_neighbors(self, point):
+        """ List of all four diagonal neighbors of point """
+        return [
+            point - self.NS - 1,
+            point - self.NS + 1,
+            point + self.NS - 1,
+            point + self.NS + 1,
+        ]
+
+    def last_board_moves(self):
+        """
+        Get the list of last_move and second last move.
+        Only include moves on the board (not None, not PASS).
+        """
+        board_moves = []
+        if self.last_move != None and self.last_move != PASS:
+            board_moves.append(self.last_move)
+        if self.last2_move != None and self.last2_move != PASS:
+            board_moves.append(self.last2_move)
+        return board_moves
+
+    def get_result(self, color, move, win_condition):
+        for first, second in (("N", "S"), ("NE", "SW"), ("E", "W"), ("SE", "NW")):
+            if win_condition-1 <= self.check_direction(color, move, first) \
+                + self.check_direction(color, move, second):
+                if color == 1:
+                    return "black"
+                else:
+                    return "white"
+
+        if self.num_empty == 0:
+            return "draw"
+        if win_condition == WIN_CONDITION and self.is_dead_draw():
+            return "draw"
+        return "unknown"
+
+    def check_direction(self, color, pos, direction):
+        increment = self.increments[direction]
+        board = self.board
+
+        num = 0
+        pos += increment
+        while board[pos] == color:
+            pos += increment
+            num += 1
+
+        return num
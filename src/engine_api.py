@@ -0,0 +1,149 @@
+"""
+engine_api.py
+
+In-process interface to the engine for batch tools and self-play.
+
+Engine wraps a board and a FlatMCSimPlayer and works on integer points
+and colors (BLACK, WHITE) throughout: no coordinate strings, no GTP
+parsing and no output. Points are the board's own padded 1D points, as
+returned by GoBoard.pt(row, col) or coord_to_point.
+
+    from board_util import coord_to_point
+    engine = Engine(7, {"numSimulations": 50}, seed=1)
+    engine.play(coord_to_point(4, 4, 7))
+    reply = engine.genmove()
+    engine.undo()
+"""
+
+from typing import Dict, List, Optional
+from board_util import GoBoardUtil, BLACK, PASS, WIN_CONDITION
+from selfplay import make_player
+
+
+class Engine(object):
+    def __init__(self, size: int = 7, config: Optional[dict] = None,
+                 seed: Optional[int] = None, board_class=None):
+        """
+        size: the board size.
+        config: engine config dict of selfplay.make_player, e.g.
+            {"numSimulations": 50, "policy": "rule"}.
+        seed: seed of the player's random number generator.
+        board_class: GoBoard (default) or CompactGoBoard.
+        Raises ValueError if config has a numSimulations or roundSize
+        below 1.
+        """
+        if board_class is None:
+            from board import GoBoard as board_class
+        self.config = dict(config or {})
+        self.board = board_class(size)
+        self.player = make_player(self.config, self.board, seed)
+        self.new_game(size)
+
+    def new_game(self, size: Optional[int] = None) -> None:
+        """ Clear the board, optionally changing its size """
+        self.board.reset(self.board.size if size is None else size)
+        self.player.set_board(self.board)
+        self.moves = []
+        self.results = ["unknown"]
+
+    @property
+    def to_play(self) -> int:
+        return self.board.current_player
+
+    @property
+    def result(self) -> str:
+        """ "black", "white", "draw" or "unknown" """
+        return self.results[-1]
+
+    def legal_moves(self) -> List[int]:
+        if self.result != "unknown":
+            return []
+        return GoBoardUtil.generate_legal_moves(self.board, self.to_play)
+
+    def play(self, point: int, color: Optional[int] = None) -> str:
+        """
+        Play point for color (default: the color to play).
+        Raises ValueError if the game is over or point is not empty.
+        Returns the result after the move.
+        """
+        if color is None:
+            color = self.to_play
+        if self.result != "unknown":
+            raise ValueError("game is over: {}".format(self.result))
+        if not self.board.is_legal(point, color):
+            raise ValueError("illegal move: {}".format(point))
+        self.board.play_move(point, color)
+        self.board.current_player = GoBoardUtil.opponent(color)
+        self.moves.append((point, color))
+        self.results.append(self.board.get_result(color, point, WIN_CONDITION))
+        return self.result
+
+    def undo(self) -> int:
+        """ Take back the last move and return its point """
+        point, color = self.moves.pop()
+        self.board.undo_move(point)
+        self.board.current_player = color
+        self.results.pop()
+        return point
+
+    def genmove(self, color: Optional[int] = None,
+                simulations: Optional[int] = None,
+                time_limit: Optional[float] = None,
+                play: bool = True) -> int:
+        """
+        Search for the best move of color (default: the color to play)
+        with a budget of simulations playouts per move and/or time_limit
+        seconds; the engine config is used for what is not given.
+        The move is played unless play is False.
+        Returns the move, or PASS if the game is over.
+        Raises ValueError if simulations is less than 1.
+        """
+        if color is None:
+            color = self.to_play
+        if simulations is not None and simulations < 1:
+            raise ValueError("simulations must be at least 1: {}".format(simulations))
+        if self.result != "unknown":
+            return PASS
+        player = self.player
+        budget = (player.numSimulations, player.timeLimit)
+        if simulations is not None:
+            player.numSimulations = simulations
+        if time_limit is not None:
+            player.timeLimit = time_limit
+        try:
+            move = player.startSimulation(self.board, self._color_char(color),
+                                          self._policy())
+        finally:
+            player.numSimulations, player.timeLimit = budget
+        if move == PASS:
+            return PASS
+        move = int(move)
+        if play:
+            self.play(move, color)
+        return move
+
+    def evaluate(self, color: Optional[int] = None,
+                 simulations: Optional[int] = None) -> Dict[int, float]:
+        """
+        Win rate of color (default: the color to play) after each legal
+        move, from simulations playouts per move (default: the engine's
+        numSimulations). Draws count as half a win.
+        Raises ValueError if simulations is less than 1.
+        """
+        if color is None:
+            color = self.to_play
+        if simulations is None:
+            simulations = self.player.numSimulations
+        if simulations < 1:
+            raise ValueError("simulations must be at least 1: {}".format(simulations))
+        scores = {}
+        for move in self.legal_moves():
+            stats = self.player.simulate_round(move, color, simulations, self._policy())
+            scores[move] = self.player.stats_score(stats, color) / simulations
+        return scores
+
+    def _policy(self) -> str:
+        return self.config.get("policy", "random")
+
+    def _color_char(self, color: int) -> str:
+        return "b" if color == BLACK else "w"
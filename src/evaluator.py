@@ -0,0 +1,80 @@
+"""
+evaluator.py
+
+Static evaluation of Gomoku positions, used to score rollouts that are
+cut off before the end of the game (see FlatMCSimPlayer.rolloutDepth).
+
+The evaluation only reads the open window counts that the board keeps
+up to date on every move (see GoBoard._initialize_windows), so it costs
+one pass over the windows instead of the rest of a playout.
+
+Threats are classified like FlatMCSimPlayer.line_rule:
+- a four of a color is an empty point that completes a window of
+  WIN_CONDITION points for it: a "Win" point of that color and a
+  "BlockWin" point of its opponent;
+- a three of a color is an empty point that makes two different fours
+  at once. This includes every "OpenFour" point, e.g. the point that
+  turns _XXX__ into _XXXX_.
+"""
+
+import math
+from board_util import GoBoardUtil, EMPTY, WIN_CONDITION
+
+"""
+Weight of an open window by the number of stones in it, and of a
+three. Scores are the difference of the weighted sums of the two
+colors, mapped to [0, 1] by a logistic with scale SCORE_SCALE.
+"""
+WINDOW_WEIGHTS = (0, 1, 4, 16, 64)
+THREE_WEIGHT = 32
+SCORE_SCALE = 40.0
+
+
+def threats(board, color):
+    """
+    Return (fours, threes, weight) for color on board: the sets of its
+    four and three points, and the weighted count of its open windows.
+    """
+    mine = board.window_stones[color]
+    theirs = board.window_stones[GoBoardUtil.opponent(color)]
+    points = board.board
+    fours = set()
+    makes = {}
+    weight = 0
+    for w, window in enumerate(board.windows):
+        if theirs[w]:
+            continue
+        n = mine[w]
+        weight += WINDOW_WEIGHTS[n] if n < WIN_CONDITION else 0
+        if n == WIN_CONDITION - 1:
+            fours.update(p for p in window if points[p] == EMPTY)
+        elif n == WIN_CONDITION - 2:
+            a, b = [p for p in window if points[p] == EMPTY]
+            makes.setdefault(a, set()).add(b)
+            makes.setdefault(b, set()).add(a)
+    threes = {p for p, completions in makes.items() if len(completions) >= 2}
+    return fours, threes, weight
+
+
+def evaluate(board, color):
+    """
+    Estimated score of color, to move on board: 1 for a win, 0 for a
+    loss and 0.5 for a draw, in between for an uncertain position.
+    Positions with a four of color, or a three of color and no four of
+    the opponent, are won; two fours of the opponent are lost; no open
+    window for either side is a draw.
+    """
+    opponent = GoBoardUtil.opponent(color)
+    my_fours, my_threes, my_weight = threats(board, color)
+    if my_fours:
+        return 1.0
+    their_fours, their_threes, their_weight = threats(board, opponent)
+    if len(their_fours) >= 2:
+        return 0.0
+    if my_threes and (not their_fours or their_fours & my_threes):
+        return 1.0
+    if board.is_dead_draw():
+        return 0.5
+    score = (my_weight + THREE_WEIGHT * len(my_threes)) - \
+            (their_weight + THREE_WEIGHT * len(their_threes))
+    return 1.0 / (1.0 + math.exp(-score / SCORE_SCALE))
@@ -20,12 +20,29 @@ from board_util import (
     coord_to_point,
     WIN_CONDITION
 )
-import numpy as np
+import collections
+import queue
+import random
 import re
+import threading
+import time
+
+LEADING_NUMBER = re.compile(r"^\d+")
+
+"""
+Number of functions listed in each table of a profile report.
+"""
+PROFILE_TOP = 20
+
+"""
+Number of moves listed in each progress line of the analyze command.
+"""
+ANALYZE_TOP = 5
 
 
 class GtpConnection:
-    def __init__(self, go_engine, board, debug_mode=False):
+    def __init__(self, go_engine, board, debug_mode=False, tracer=None,
+                 recorder=None, out=None):
         """
         Manage a GTP connection for a Go-playing engine
 
@@ -35,13 +52,38 @@ class GtpConnection:
             a program that can reply to a set of GTP commands below
         board: 
             Represents the current board state.
+        tracer:
+            optional gtp_trace.CommandTracer that times every command.
+        recorder:
+            optional replay.Recorder that writes every command and the
+            seed of every search, for replay.py.
+        out:
+            the stream responses are written to, stdout by default.
         """
         self.policy="random"
+        # genmove plays the rule policy's move unless search is set,
+        # then it searches with FlatMCSimPlayer.startSimulation
+        self.search = False
+        # optional autotune.TunedConfigs, applied to the player for the
+        # board size on every boardsize, see apply_tuned_config
+        self.tuned = None
         self.result = "unknown"
         self._debug_mode = debug_mode
+        self.tracer = tracer
+        self.recorder = recorder
+        self.out = stdout if out is None else out
+        # every search gets its own seed, drawn from self.seeds unless
+        # replay_seeds holds recorded ones; see seed_search
+        self.seeds = random.Random()
+        self.replay_seeds = collections.deque()
+        self.last_search = None
         self.go_engine = go_engine
         self.board = board
         self.player = go_engine
+        # queue of input lines while start_connection runs, None otherwise
+        self.input = None
+        # last response of each read-only query, see cached_response
+        self.response_cache = {}
         self.commands = {
             "protocol_version": self.protocol_version_cmd,
             "quit": self.quit_cmd,
@@ -57,6 +99,8 @@ class GtpConnection:
             "policy_moves": self.policy_moves_cmd,
             "list_commands": self.list_commands_cmd,
             "play": self.play_cmd,
+            "play_sequence": self.play_sequence_cmd,
+            "setup": self.setup_cmd,
             "legal_moves": self.legal_moves_cmd,
             "gogui-rules_game_id": self.gogui_rules_game_id_cmd,
             "gogui-rules_board_size": self.gogui_rules_board_size_cmd,
@@ -64,7 +108,11 @@ class GtpConnection:
             "gogui-rules_side_to_move": self.gogui_rules_side_to_move_cmd,
             "gogui-rules_board": self.gogui_rules_board_cmd,
             "gogui-rules_final_result": self.gogui_rules_final_result_cmd,
-            "gogui-analyze_commands": self.gogui_analyze_cmd
+            "gogui-analyze_commands": self.gogui_analyze_cmd,
+            "trace_stats": self.trace_stats_cmd,
+            "profile": self.profile_cmd,
+            "solve": self.solve_cmd,
+            "analyze": self.analyze_cmd
         }
 
         # used for argument checking
@@ -77,24 +125,40 @@ class GtpConnection:
             "genmove": (1, "Usage: genmove {w,b}"),
             "play": (2, "Usage: play {b,w} MOVE"),
             "legal_moves": (1, "Usage: legal_moves {w,b}"),
-            "policy":(1,"Usage: policy [policytype]")
+            "policy":(1,"Usage: policy [policytype]"),
+            "analyze": (2, "Usage: analyze {b,w} INTERVAL")
         }
 
     def write(self, data):
-        stdout.write(data)
+        self.out.write(data)
 
     def flush(self):
-        stdout.flush()
+        self.out.flush()
 
     def start_connection(self):
         """
         Start a GTP connection. 
         This function continuously monitors standard input for commands.
+        Input is read on a separate thread into self.input, so that a
+        running analyze command can stop as soon as the next command
+        arrives.
         """
-        line = stdin.readline()
+        self.input = queue.Queue()
+        reader = threading.Thread(target=self.read_input, daemon=True)
+        reader.start()
+        line = self.input.get()
         while line:
             self.get_cmd(line)
+            line = self.input.get()
+        self.input = None
+
+    def read_input(self):
+        """ Put every line of standard input on self.input, then "" """
+        line = stdin.readline()
+        while line:
+            self.input.put(line)
             line = stdin.readline()
+        self.input.put("")
 
     def get_cmd(self, command):
         """
@@ -106,7 +170,7 @@ class GtpConnection:
             return
         # Strip leading numbers from regression tests
         if command[0].isdigit():
-            command = re.sub("^\d+", "", command).lstrip()
+            command = LEADING_NUMBER.sub("", command).lstrip()
 
         elements = command.split()
         if not elements:
@@ -116,16 +180,25 @@ class GtpConnection:
         if self.has_arg_error(command_name, len(args)):
             return
         if command_name in self.commands:
+            self.last_search = None
+            start = time.perf_counter()
             try:
-                self.commands[command_name](args)
+                if self.tracer is None:
+                    self.commands[command_name](args)
+                else:
+                    self.tracer.run(self, command_name, args)
             except Exception as e:
                 self.debug_msg("Error executing command {}\n".format(str(e)))
                 self.debug_msg("Stack Trace:\n{}\n".format(traceback.format_exc()))
                 raise e
+            finally:
+                if self.recorder is not None:
+                    self.recorder.record(" ".join(elements), self.last_search,
+                                         time.perf_counter() - start)
         else:
             self.debug_msg("Unknown command: {}\n".format(command_name))
             self.error("Unknown command")
-            stdout.flush()
+            self.flush()
 
     def has_arg_error(self, cmd, argnum):
         """
@@ -137,21 +210,55 @@ class GtpConnection:
             return True
         return False
 
-    def debug_msg(self, msg):
-        """ Write msg to the debug stream """
+    def debug_msg(self, msg, *args):
+        """
+        Write msg to the debug stream.
+        args are formatted into msg only in debug mode; callable args
+        are called first, so expensive output such as board2d is never
+        built when debugging is off.
+        """
         if self._debug_mode:
+            if args:
+                msg = msg.format(*[a() if callable(a) else a for a in args])
             stderr.write(msg)
             stderr.flush()
 
     def error(self, error_msg):
         """ Send error msg to stdout """
-        stdout.write("? {}\n\n".format(error_msg))
-        stdout.flush()
+        self.write("? {}\n\n".format(error_msg))
+        self.flush()
 
     def respond(self, response=""):
         """ Send response to stdout """
-        stdout.write("= {}\n\n".format(response))
-        stdout.flush()
+        self.write("= {}\n\n".format(response))
+        self.flush()
+
+    def seed_search(self):
+        """
+        Seed the player's random number streams for the next search with
+        the next recorded seed, or a new one from self.seeds.
+        Returns the seed.
+        """
+        if self.replay_seeds:
+            seed = self.replay_seeds.popleft()
+        else:
+            seed = self.seeds.getrandbits(63)
+        self.player.seed(seed)
+        return seed
+
+    def cached_response(self, name, args, build):
+        """
+        Return build(), or the response already built for command name
+        with the same args on the same position: same board changes
+        counter (see GoBoard.reset), color to play and game result.
+        """
+        key = (tuple(args), self.board.changes, self.board.current_player, self.result)
+        entry = self.response_cache.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        response = build()
+        self.response_cache[name] = (key, response)
+        return response
 
     def reset(self, size):
         """
@@ -190,8 +297,22 @@ class GtpConnection:
         Reset the game with new boardsize args[0]
         """
         self.reset(int(args[0]))
+        self.apply_tuned_config()
         self.respond()
 
+    def apply_tuned_config(self):
+        """
+        Set up the player with the tuned config of the board size, and
+        the policy if the config names one.
+        """
+        if self.tuned is None:
+            return
+        from selfplay import apply_config
+        config = self.tuned.config(self.board.size)
+        apply_config(self.player, config)
+        if "policy" in config:
+            self.policy = "rulebased" if config["policy"] == "rule" else "random"
+
         """
     ==========================================================================
     Assignment 1 - game-specific commands start here
@@ -218,6 +339,10 @@ class GtpConnection:
 
     def gogui_rules_legal_moves_cmd(self, args):
         """ Implement this function for Assignment 1 """
+        self.respond(self.cached_response("gogui-rules_legal_moves", args,
+                                          self.gogui_rules_legal_moves))
+
+    def gogui_rules_legal_moves(self):
         string = ""
         if self.result == "unknown":
             empty_points = self.board.get_empty_points()
@@ -234,7 +359,7 @@ class GtpConnection:
             if len(string)>0:
                 string = string[0:len(string)-1]
 
-        self.respond(string)
+        return string
 
     def gogui_rules_side_to_move_cmd(self, args):
         """ We already implemented this function for Assignment 1 """
@@ -243,6 +368,10 @@ class GtpConnection:
 
     def gogui_rules_board_cmd(self, args):
         """ We already implemented this function for Assignment 1 """
+        self.respond(self.cached_response("gogui-rules_board", args,
+                                          self.gogui_rules_board))
+
+    def gogui_rules_board(self):
         size = self.board.size
         str = ''
         for row in range(size-1, -1, -1):
@@ -259,7 +388,7 @@ class GtpConnection:
                 else:
                     assert False
             str += '\n'
-        self.respond(str)
+        return str
             
     def gogui_rules_final_result_cmd(self, args):
         """ Implement this function for Assignment 1 """
@@ -271,40 +400,68 @@ class GtpConnection:
         """
         play a move args[1] for given color args[0] in {'b','w'}
         """
-        try:
-            board_color = args[0].lower()
-            board_move = args[1]
+        board_color = args[0].lower()
+        board_move = args[1].lower()
+        if board_color not in ['b', 'w']:
+            self.respond('illegal move: "{}" wrong color'.format(board_color))
+            return
+        str_to_point = point_tables(self.board.size)[1]
+        move = str_to_point.get(board_move)
+        if move is None:
+            self.respond('illegal move: "{}" wrong coordinate'.format(board_move))
+            return
+        color = color_to_int(board_color)
+        if not self.board.play_move(move, color):
+            self.respond('illegal move: "{}" occupied'.format(self.board.coord(move)))
+            return
+        self.debug_msg("Move: {}\nBoard:\n{}\n", board_move, self.board2d)
+        self.respond()
+        self.board.current_player = GoBoardUtil.opponent(color)
+        self.update_result(color, move)
 
-            if board_color not in ['b', 'w']:
-                self.respond('illegal move: "{}" wrong color'.format(board_color))
-                return
+    def play_sequence_cmd(self, args):
+        """
+        Play a whole list of moves in one command:
+        play_sequence {b,w} MOVE [{b,w} MOVE ...]
+        Stops at the first illegal move and reports its position.
+        """
+        if len(args) % 2 != 0:
+            self.respond("Usage: play_sequence {b,w} MOVE [{b,w} MOVE ...]")
+            return
+        colors = [arg.lower() for arg in args[0::2]]
+        self.respond(self.play_moves(colors, args[1::2]))
 
-            coord = move_to_coord(args[1], self.board.size)
-            if coord:
-                move = coord_to_point(coord[0], coord[1], self.board.size)
-            else:
-                self.respond('illegal move: "{}" wrong coordinate'.format(self.board.coord(move)))
-                return
+    def setup_cmd(self, args):
+        """
+        Clear the board and play the moves in args, alternating colors
+        and starting with black: setup MOVE [MOVE ...]
+        """
+        self.reset(self.board.size)
+        self.result = "unknown"
+        colors = ["b", "w"] * ((len(args) + 1) // 2)
+        self.respond(self.play_moves(colors, args))
 
+    def play_moves(self, colors, moves):
+        """
+        Play moves for the matching colors in {'b','w'}.
+        Returns an empty string on success, or the error message for
+        the first move that could not be played.
+        """
+        str_to_point = point_tables(self.board.size)[1]
+        for i, (board_color, board_move) in enumerate(zip(colors, moves)):
+            board_move = board_move.lower()
+            move = str_to_point.get(board_move)
+            if board_color not in ['b', 'w']:
+                return 'illegal move {}: "{}" wrong color'.format(i + 1, board_color)
+            if move is None:
+                return 'illegal move {}: "{}" wrong coordinate'.format(i + 1, board_move)
             color = color_to_int(board_color)
-            if args[1].lower() == "pass":
-                self.board.play_move(PASS, color)
-                self.board.current_player = GoBoardUtil.opponent(color)
-                self.respond()
-                return
-            
             if not self.board.play_move(move, color):
-                self.respond('illegal move: "{}" occupied'.format(self.board.coord(move)))
-                return
-            else:
-                self.debug_msg(
-                    "Move: {}\nBoard:\n{}\n".format(board_move, self.board2d())
-                )
-            self.respond()
+                return 'illegal move {}: "{}" occupied'.format(i + 1, board_move)
             self.board.current_player = GoBoardUtil.opponent(color)
             self.update_result(color, move)
-        except Exception:
-            self.respond('illegal move: "{}" wrong coordinate'.format(board_move.lower()))
+        self.debug_msg("Board:\n{}\n", self.board2d)
+        return ""
 
     def update_result(self, color, move):
         if self.result == "unknown" or self.result == "draw":
@@ -320,7 +477,7 @@ class GtpConnection:
                     self.result = "white"
                 return
  
-            if self.board.get_empty_points().size == 0:
+            if len(self.board.get_empty_points()) == 0 or self.board.is_dead_draw():
                 self.result = "draw"
 
     def getResult(self):
@@ -367,9 +524,16 @@ class GtpConnection:
 
         else:
             self.player.set_board(self.board)
-            move = self.player.get_rule_move(color)
-            move_coord = point_to_coord(move, self.board.size)
-            move_as_string = format_point(move_coord).lower()
+            seed = self.seed_search()
+            playouts = self.player.playouts
+            if self.search:
+                policy = "rule" if self.policy.lower() == "rulebased" else "random"
+                move = self.player.startSimulation(self.board, board_color, policy)
+            else:
+                move = self.player.get_rule_move(color)
+            move_as_string = point_tables(self.board.size)[0][move].lower()
+            self.last_search = {"seed": seed, "move": move_as_string,
+                                "playouts": self.player.playouts - playouts}
             if self.board.is_legal(move, color):
                 self.board.play_move(move, color)
                 self.update_result(color, move)
@@ -380,6 +544,72 @@ class GtpConnection:
 
         self.board.current_player = GoBoardUtil.opponent(color)
     
+    def solve_cmd(self, args):
+        """
+        Prove a win or loss with proof-number search:
+        solve {b,w} [NODE_BUDGET]
+        Responds "win MOVE", "loss" or "unknown" for the given color to move.
+        """
+        from pn_search import solve, NODE_BUDGET
+        if len(args) not in (1, 2) or args[0].lower() not in ("b", "w"):
+            self.error("Usage: solve {b,w} [NODE_BUDGET]")
+            return
+        color = color_to_int(args[0].lower())
+        budget = int(args[1]) if len(args) == 2 else NODE_BUDGET
+        self.player.set_board(self.board)
+        result, move = solve(self.board, color, budget, rules_player=self.player)
+        if result == "win":
+            self.respond("win " + point_tables(self.board.size)[0][move].lower())
+        else:
+            self.respond(result)
+
+    def analyze_cmd(self, args):
+        """
+        Search for color args[0] in {'b','w'} until the next command
+        arrives: analyze {b,w} INTERVAL
+        Every INTERVAL centiseconds a progress line is written with the
+        ANALYZE_TOP best moves so far, their playouts, win rates and
+        rule buckets (see FlatMCSimPlayer.rule_buckets):
+            info move c3 visits 120 winrate 0.6250 rule OpenFour info move ...
+        The response ends with an empty line once the search stops.
+        Without the input loop of start_connection there is no next
+        command to wait for, and the search stops after one interval.
+        """
+        board_color = args[0].lower()
+        if board_color not in ("b", "w") or not args[1].isdigit():
+            self.error("Usage: analyze {b,w} INTERVAL")
+            return
+        interval = int(args[1]) / 100.0
+        color = color_to_int(board_color)
+        self.write("= \n")
+        self.flush()
+        if self.result == "unknown":
+            point_to_str = point_tables(self.board.size)[0]
+            self.player.set_board(self.board)
+            rule_of = {}
+            for rule, moves in self.player.rule_buckets(color):
+                for move in moves:
+                    rule_of[move] = rule
+
+            def report(ranked):
+                self.write(" ".join(
+                    "info move {} visits {} winrate {:.4f} rule {}".format(
+                        point_to_str[move].lower(), visits, winrate, rule_of[move])
+                    for move, visits, winrate in ranked[:ANALYZE_TOP]) + "\n")
+                self.flush()
+
+            if self.input is None:
+                deadline = time.perf_counter() + interval
+                stop = lambda: time.perf_counter() >= deadline
+            else:
+                stop = lambda: not self.input.empty()
+            policy = "rule" if self.policy.lower() == "rulebased" else "random"
+            seed = self.seed_search()
+            self.player.analyze(self.board, board_color, policy, interval, stop, report)
+            self.last_search = {"seed": seed}
+        self.write("\n")
+        self.flush()
+
     def setPolicy(self,args):
         policy=args[0]
         if policy.lower()=='random' or policy.lower()=='rulebased':
@@ -389,32 +619,20 @@ class GtpConnection:
             self.respond("Usage: policy [policytype] , where policytype = random or policytype = rulebased")
 
     def policy_moves_cmd(self,args):
+        self.respond(self.cached_response("policy_moves", args, self.policy_moves))
+
+    def policy_moves(self):
         self.player.set_board(self.board)
         moves_dic = self.player.rules(self.board.current_player)
         if moves_dic == "pass":
-            self.respond("")
-        else:
-            
-            for rule, moves in moves_dic.items():
-                string = rule + " "
-                #
-                for column in range(self.board.size):
-                    letter = chr(column+ord("a"))
-                    for move in moves:
-                        move = point_to_coord(move, self.board.size)
-                        move = format_point(move).lower()  
-                        if move[0] == letter:
-                            string += move
-                            string += " "
-                """
-                for move in moves:  
-                    move_coord = point_to_coord(move, self.board.size)
-                    move_as_string = format_point(move_coord).lower()
-                    string += move_as_string
-                    string += " "
-                """
-                string = string[:len(string)-1]
-            self.respond(string)
+            return ""
+        point_to_str = point_tables(self.board.size)[0]
+        NS = self.board.size + 1
+        for rule, moves in moves_dic.items():
+            # list moves column by column, as in the board display
+            moves = sorted(moves, key=lambda move: (move % NS, move))
+            string = " ".join([rule] + [point_to_str[move].lower() for move in moves])
+        return string
 
     """
     ==========================================================================
@@ -423,7 +641,8 @@ class GtpConnection:
     """
 
     def showboard_cmd(self, args):
-        self.respond("\n" + self.board2d())
+        self.respond(self.cached_response("showboard", args,
+                                          lambda: "\n" + self.board2d()))
 
     def komi_cmd(self, args):
         """
@@ -441,6 +660,59 @@ class GtpConnection:
         else:
             self.respond("false")
 
+    def trace_stats_cmd(self, args):
+        """
+        Show the per-command latency histograms, or clear them with
+        trace_stats reset
+        """
+        if self.tracer is None:
+            self.error("tracing is off")
+        elif args and args[0] == "reset":
+            self.tracer.reset()
+            self.respond()
+        else:
+            self.respond("\n" + self.tracer.summary())
+
+    def profile_cmd(self, args):
+        """
+        Run a command under cProfile: profile [-o FILE] COMMAND [ARGS]
+        The wrapped command responds exactly as it would on its own.
+        The top functions by cumulative and by self time are written
+        to stderr, or to FILE with -o.
+        """
+        import cProfile
+        import io
+        import pstats
+        output = None
+        if len(args) >= 2 and args[0] == "-o":
+            output = args[1]
+            args = args[2:]
+        if not args or args[0] == "profile":
+            self.error("Usage: profile [-o FILE] COMMAND [ARGS]")
+            return
+        command_name = args[0]
+        command_args = args[1:]
+        if command_name not in self.commands:
+            self.error("Unknown command")
+            return
+        if self.has_arg_error(command_name, len(command_args)):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(self.commands[command_name], command_args)
+        finally:
+            report = io.StringIO()
+            report.write("Profile: {}\n".format(" ".join(args)))
+            stats = pstats.Stats(profiler, stream=report)
+            for sort_key in ("cumulative", "tottime"):
+                stats.sort_stats(sort_key).print_stats(PROFILE_TOP)
+            if output is None:
+                stderr.write(report.getvalue())
+                stderr.flush()
+            else:
+                with open(output, "w") as f:
+                    f.write(report.getvalue())
+
     def list_commands_cmd(self, args):
         """ list all supported GTP commands """
         self.respond(" ".join(list(self.commands.keys())))
@@ -451,15 +723,15 @@ class GtpConnection:
         """
         List legal moves for color args[0] in {'b','w'}
         """
-        board_color = args[0].lower()
-        color = color_to_int(board_color)
+        self.respond(self.cached_response("legal_moves", args,
+                                          lambda: self.legal_moves(args[0])))
+
+    def legal_moves(self, board_color):
+        color = color_to_int(board_color.lower())
         moves = GoBoardUtil.generate_legal_moves(self.board, color)
-        gtp_moves = []
-        for move in moves:
-            coords = point_to_coord(move, self.board.size)
-            gtp_moves.append(format_point(coords))
-        sorted_moves = " ".join(sorted(gtp_moves))
-        self.respond(sorted_moves)
+        point_to_str = point_tables(self.board.size)[0]
+        gtp_moves = [point_to_str[move] for move in moves]
+        return " ".join(sorted(gtp_moves))
 
 
 def point_to_coord(point, boardsize):
@@ -489,6 +761,32 @@ def format_point(move):
     return column_letters[col - 1] + str(row)
 
 
+_point_tables = {}
+
+
+def point_tables(boardsize):
+    """
+    Return the (point_to_str, str_to_point) lookup tables for boardsize.
+    point_to_str maps a point to its GTP string such as 'A1',
+    str_to_point maps a lowercase GTP string to its point.
+    The tables are built once per board size with format_point, so they
+    agree with point_to_coord, format_point and move_to_coord.
+    """
+    tables = _point_tables.get(boardsize)
+    if tables is None:
+        point_to_str = {PASS: "PASS"}
+        str_to_point = {}
+        for row in range(1, boardsize + 1):
+            for col in range(1, boardsize + 1):
+                point = coord_to_point(row, col, boardsize)
+                point_str = format_point((row, col))
+                point_to_str[point] = point_str
+                str_to_point[point_str.lower()] = point
+        tables = (point_to_str, str_to_point)
+        _point_tables[boardsize] = tables
+    return tables
+
+
 def move_to_coord(point_str, board_size):
     """
     Convert a string point_str representing a point, as specified by GTP,
@@ -0,0 +1,136 @@
+"""
+gtp_trace.py
+
+Optional tracing layer for GtpConnection.
+
+CommandTracer times every GTP command (wall clock and CPU time) into
+per-command HDR-style histograms, and can write one JSON line per command
+with its arguments, the board size, the stones on the board, the playouts
+run and the duration.
+"""
+
+import json
+import time
+
+
+class Histogram(object):
+    """
+    Log-linear histogram of non-negative integer values, in the style of
+    HdrHistogram: values below 2^sub_bits are counted exactly, larger
+    values in buckets whose width grows with the value, so the relative
+    error of every recorded value is below 2 / 2^sub_bits.
+    """
+    def __init__(self, sub_bits=7):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.half_count = self.sub_count >> 1
+        self.reset()
+
+    def reset(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def bucket_index(self, value):
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        return shift * self.half_count + (value >> shift)
+
+    def bucket_value(self, index):
+        """ Lowest value counted in bucket index """
+        if index < self.sub_count:
+            return index
+        shift = index // self.half_count - 1
+        return (index - shift * self.half_count) << shift
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self.bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def mean(self):
+        return self.sum / self.total if self.total else 0.0
+
+    def percentile(self, p):
+        """ Smallest recorded bucket value with at least p percent of values at or below it """
+        if not self.total:
+            return 0
+        rank = max(1, int(round(p / 100.0 * self.total)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.bucket_value(index), self.max)
+        return self.max
+
+
+class CommandTracer(object):
+    """
+    Times GTP commands into histograms of microseconds and optionally
+    logs them as JSON lines to log_file.
+    """
+    def __init__(self, log_file=None):
+        self.log_file = log_file
+        self.wall = {}
+        self.cpu = {}
+
+    def run(self, connection, command_name, args):
+        """
+        Run command_name with args on connection and trace it.
+        """
+        playouts = getattr(connection.player, "playouts", 0)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            connection.commands[command_name](args)
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            playouts = getattr(connection.player, "playouts", 0) - playouts
+            self.record(connection.board, command_name, args, wall, cpu, playouts)
+
+    def record(self, board, command_name, args, wall, cpu, playouts):
+        if command_name not in self.wall:
+            self.wall[command_name] = Histogram()
+            self.cpu[command_name] = Histogram()
+        self.wall[command_name].record(wall * 1e6)
+        self.cpu[command_name].record(cpu * 1e6)
+        if self.log_file is not None:
+            entry = {
+                "time": time.time(),
+                "command": command_name,
+                "args": args,
+                "size": board.size,
+                "stones": board.size * board.size - len(board.get_empty_points()),
+                "playouts": playouts,
+                "wall_ms": round(wall * 1e3, 3),
+                "cpu_ms": round(cpu * 1e3, 3),
+            }
+            self.log_file.write(json.dumps(entry) + "\n")
+            self.log_file.flush()
+
+    def reset(self):
+        self.wall = {}
+        self.cpu = {}
+
+    def summary(self):
+        """
+        One line per command: count, then mean, p50, p90, p99 and max
+        of wall and CPU time in milliseconds.
+        """
+        lines = ["command count wall:mean/p50/p90/p99/max cpu:mean/p50/p90/p99/max (ms)"]
+        for command_name in sorted(self.wall):
+            fields = [command_name, str(self.wall[command_name].total)]
+            for histogram in (self.wall[command_name], self.cpu[command_name]):
+                values = [histogram.mean()] + \
+                    [histogram.percentile(p) for p in (50, 90, 99)] + [histogram.max]
+                fields.append("/".join("{:.3f}".format(v / 1e3) for v in values))
+            lines.append(" ".join(fields))
+        return "\n".join(lines)
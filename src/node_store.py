@@ -0,0 +1,184 @@
+"""
+node_store.py
+
+Compact storage for search tree nodes.
+
+Instead of one Python object per node, the nodes live in preallocated
+numpy columns (struct of arrays), and a node is just an index into them:
+
+    move          the move leading to the node
+    visits        number of playouts through the node
+    wins          wins for the player who made move (draws count 0.5)
+    first_child   index of the first child, NULL if none
+    next_sibling  index of the next child of the same parent, NULL if
+                  none; for free nodes, the next node of the free list
+
+A node takes 20 bytes, so a million nodes fit in about 20 MB.
+The number of nodes is capped at capacity. Nodes that become unreachable
+when a move is played are put back on the free list (see promote).
+"""
+
+import numpy as np
+
+"""
+Index used for "no node".
+"""
+NULL = -1
+
+
+class NodeStore(object):
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.move = np.zeros(capacity, dtype=np.int32)
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.wins = np.zeros(capacity, dtype=np.float32)
+        self.first_child = np.full(capacity, NULL, dtype=np.int32)
+        self.next_sibling = np.full(capacity, NULL, dtype=np.int32)
+        self.clear()
+
+    def clear(self):
+        """ Free all nodes """
+        # nodes below self.top have never been used and are handed out
+        # in order, before falling back to the free list
+        self.top = 0
+        self.free_head = NULL
+        self.num_used = 0
+
+    @property
+    def nbytes(self):
+        return (self.move.nbytes + self.visits.nbytes + self.wins.nbytes
+                + self.first_child.nbytes + self.next_sibling.nbytes)
+
+    @property
+    def available(self):
+        """ Number of nodes that can still be allocated """
+        return self.capacity - self.num_used
+
+    def new_node(self, move):
+        """
+        Allocate a node for move with no statistics and no children.
+        Returns its index, or NULL if the store is full.
+        """
+        if self.free_head != NULL:
+            node = self.free_head
+            self.free_head = int(self.next_sibling[node])
+        elif self.top < self.capacity:
+            node = self.top
+            self.top += 1
+        else:
+            return NULL
+        self.move[node] = move
+        self.visits[node] = 0
+        self.wins[node] = 0
+        self.first_child[node] = NULL
+        self.next_sibling[node] = NULL
+        self.num_used += 1
+        return node
+
+    def add_child(self, parent, move):
+        """
+        Add a child for move in front of the children of parent.
+        Returns its index, or NULL if the store is full.
+        """
+        node = self.new_node(move)
+        if node != NULL:
+            self.next_sibling[node] = self.first_child[parent]
+            self.first_child[parent] = node
+        return node
+
+    def expand(self, parent, moves):
+        """
+        Add one child per move in moves to parent.
+        Returns False if the store ran full; the children added up to
+        that point are kept.
+        """
+        for move in moves:
+            if self.add_child(parent, move) == NULL:
+                return False
+        return True
+
+    def children(self, node):
+        """ Iterate over the child indices of node """
+        next_sibling = self.next_sibling
+        child = int(self.first_child[node])
+        while child != NULL:
+            yield child
+            child = int(next_sibling[child])
+
+    def child_array(self, node):
+        """
+        The child indices of node as a numpy array, so that the
+        statistics of all children can be read with one fancy index,
+        e.g. store.visits[store.child_array(node)].
+        """
+        return np.fromiter(self.children(node), dtype=np.int32)
+
+    def uct_child(self, node, exploration):
+        """
+        The child of node to descend into: the first child without
+        visits, else the one with the highest UCB1 value
+        wins / visits + exploration * sqrt(ln(visits of node) / visits).
+        Returns NULL if node has no children.
+        """
+        children = self.child_array(node)
+        if len(children) == 0:
+            return NULL
+        visits = self.visits[children]
+        unvisited = np.flatnonzero(visits == 0)
+        if len(unvisited):
+            return int(children[unvisited[0]])
+        values = self.wins[children] / visits + \
+            exploration * np.sqrt(np.log(max(int(self.visits[node]), 1)) / visits)
+        return int(children[np.argmax(values)])
+
+    def most_visited_child(self, node):
+        """ The child of node with the most visits, or NULL """
+        children = self.child_array(node)
+        if len(children) == 0:
+            return NULL
+        return int(children[np.argmax(self.visits[children])])
+
+    def find_child(self, node, move):
+        """ Index of the child of node for move, or NULL """
+        for child in self.children(node):
+            if self.move[child] == move:
+                return child
+        return NULL
+
+    def update(self, path, result_for_first):
+        """
+        Back up one playout result along path, a list of node indices
+        from the root down. result_for_first is the score (1, 0.5, 0)
+        for the player who made the move of path[0]; the score flips
+        between players at every level.
+        """
+        nodes = np.asarray(path, dtype=np.int32)
+        scores = np.empty(len(path), dtype=np.float32)
+        scores[0::2] = result_for_first
+        scores[1::2] = 1.0 - result_for_first
+        self.visits[nodes] += 1
+        self.wins[nodes] += scores
+
+    def free_subtree(self, node):
+        """ Put node and all its descendants on the free list """
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            stack.extend(self.children(n))
+            self.next_sibling[n] = self.free_head
+            self.free_head = n
+            self.num_used -= 1
+
+    def promote(self, root, child):
+        """
+        Make child the new root after its move has been played.
+        Frees root and all subtrees below it except the one of child,
+        and returns child.
+        """
+        for other in list(self.children(root)):
+            if other != child:
+                self.free_subtree(other)
+        self.next_sibling[child] = NULL
+        self.first_child[root] = NULL
+        self.free_subtree(root)
+        return child
@@ -0,0 +1,219 @@
+"""
+pn_search.py
+
+Depth-first proof-number search (df-pn) for proving wins and losses.
+
+solve(board, color) tries to prove that color, to move, can force a win,
+and then that the opponent can. It returns "win" with the proving move,
+"loss", or "unknown" if neither could be proven within the node budget.
+
+Move generation reads the points where a side makes five at once from
+the open window counts (evaluator.threats), which are exact:
+- a side with such a point has won;
+- a side facing such points of the opponent must play on one of them,
+  every other move loses at once;
+- otherwise the attacker (the side the search tries to prove a win
+  for) with an OpenFour move of FlatMCSimPlayer.rule_buckets only
+  tries those, and both sides try all moves, OpenFour and
+  BlockOpenFour moves first.
+The rule buckets only prune the attacker's moves and order the others,
+so every proof is sound even where line_rule misreads a line, while a
+disproof only means that the attacker found no win with those moves.
+
+Proof and disproof numbers are stored in a transposition table keyed by
+the board contents. Once the table holds more than max_entries
+positions, the unsolved entries with the least search work below them
+are deleted (small-tree garbage collection).
+"""
+
+from board_util import GoBoardUtil, BLACK, PASS, WIN_CONDITION
+from evaluator import threats
+
+INF = 10 ** 9
+
+"""
+Default number of df-pn node expansions per solve() call.
+"""
+NODE_BUDGET = 20000
+
+"""
+Default size of the transposition table.
+"""
+MAX_ENTRIES = 200000
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class ProofNumberSearch(object):
+    def __init__(self, board, rules_player=None, max_entries=MAX_ENTRIES):
+        """
+        board: the GoBoard (or CompactGoBoard) to search on; moves are
+        played and undone on it, it is unchanged afterwards.
+        rules_player: a FlatMCSimPlayer used for rules(); a new one is
+        created if not given.
+        """
+        if rules_player is None:
+            from Gomoku3 import FlatMCSimPlayer
+            rules_player = FlatMCSimPlayer(0, board)
+        self.board = board
+        self.player = rules_player
+        self.max_entries = max_entries
+        self.table = {}
+        self.nodes = 0
+
+    def key(self):
+        return bytes(self.board.board)
+
+    def lookup(self):
+        """ (pn, dn, work) of the current position, (1, 1, 0) if unknown """
+        return self.table.get(self.key(), (1, 1, 0))
+
+    def store(self, pn, dn, work):
+        self.table[self.key()] = (pn, dn, work)
+        if len(self.table) > self.max_entries:
+            self.collect_garbage()
+
+    def collect_garbage(self):
+        """
+        Delete the unsolved entries with the least work until the table
+        is back to half of max_entries. Proven and disproven entries are
+        only deleted if there are too many of them.
+        """
+        target = self.max_entries // 2
+        entries = sorted(self.table.items(),
+                         key=lambda item: (item[1][0] == 0 or item[1][1] == 0, item[1][2]))
+        for key, entry in entries[:len(entries) - target]:
+            del self.table[key]
+
+    def prove(self, attacker, to_play, node_budget=NODE_BUDGET):
+        """
+        Try to prove that attacker can force a win with to_play to move.
+        Returns True if proven, False if disproven, None if the node
+        budget ran out.
+        """
+        self.attacker = attacker
+        self.budget = self.nodes + node_budget
+        try:
+            self.mid(to_play, INF - 1, INF - 1)
+        except BudgetExceeded:
+            return None
+        pn, dn, work = self.lookup()
+        return pn == 0
+
+    def proving_move(self, to_play):
+        """ A move of to_play whose position is proven, or PASS """
+        for move in self.board.get_empty_points().tolist():
+            self.board.play_move(move, to_play)
+            pn = self.lookup()[0]
+            terminal = self.board.get_result(to_play, move, WIN_CONDITION)
+            self.board.undo_move(move)
+            if pn == 0 or terminal == self.color_name(self.attacker):
+                return move
+        return PASS
+
+    def color_name(self, color):
+        return "black" if color == BLACK else "white"
+
+    def generate_moves(self, to_play):
+        """
+        Return (moves, outcome) for to_play. outcome is None, or "win"
+        if to_play can win at once, in which case moves is empty.
+        """
+        if threats(self.board, to_play)[0]:
+            return [], "win"
+        blocks = threats(self.board, GoBoardUtil.opponent(to_play))[0]
+        if blocks:
+            return sorted(blocks), None
+        self.player.set_board(self.board)
+        buckets = dict(self.player.rule_buckets(to_play))
+        if to_play == self.attacker and buckets["OpenFour"]:
+            return buckets["OpenFour"], None
+        first = buckets["OpenFour"] + buckets["BlockOpenFour"]
+        seen = set(first)
+        return first + [m for m in self.board.get_empty_points().tolist()
+                        if m not in seen], None
+
+    def child_value(self, move, to_play):
+        """
+        (pn, dn) of the position after to_play plays move,
+        from the transposition table or from a terminal result.
+        """
+        self.board.play_move(move, to_play)
+        result = self.board.get_result(to_play, move, WIN_CONDITION)
+        if result == "unknown":
+            pn, dn, work = self.lookup()
+        elif result == self.color_name(self.attacker):
+            pn, dn = 0, INF
+        else:
+            pn, dn = INF, 0
+        self.board.undo_move(move)
+        return pn, dn
+
+    def mid(self, to_play, thpn, thdn):
+        """
+        Multiple iterative deepening: search the current position until
+        its proof number reaches thpn or its disproof number thdn.
+        """
+        self.nodes += 1
+        if self.nodes > self.budget:
+            raise BudgetExceeded()
+        or_node = (to_play == self.attacker)
+        moves, outcome = self.generate_moves(to_play)
+        if outcome == "win" or not moves:
+            # a side that can win at once has won, no moves is a draw
+            attacker_wins = (outcome == "win" and or_node)
+            self.store(0 if attacker_wins else INF, INF if attacker_wins else 0, 1)
+            return
+        opponent = GoBoardUtil.opponent(to_play)
+        work = 1
+        while True:
+            values = [self.child_value(move, to_play) for move in moves]
+            if or_node:
+                pn = min(v[0] for v in values)
+                dn = min(INF, sum(v[1] for v in values))
+            else:
+                pn = min(INF, sum(v[0] for v in values))
+                dn = min(v[1] for v in values)
+            if pn >= thpn or dn >= thdn or pn == 0 or dn == 0:
+                break
+            # pick the most promising child and the runner-up value
+            index = 0 if or_node else 1
+            order = sorted(range(len(moves)), key=lambda i: values[i][index])
+            best = order[0]
+            second = values[order[1]][index] if len(order) > 1 else INF
+            child_pn, child_dn = values[best]
+            if or_node:
+                child_thpn = min(thpn, second + 1)
+                child_thdn = thdn - dn + child_dn
+            else:
+                child_thpn = thpn - pn + child_pn
+                child_thdn = min(thdn, second + 1)
+            before = self.nodes
+            self.board.play_move(moves[best], to_play)
+            try:
+                self.mid(opponent, child_thpn, child_thdn)
+            finally:
+                self.board.undo_move(moves[best])
+            work += self.nodes - before
+        self.store(pn, dn, work)
+
+
+def solve(board, color, node_budget=NODE_BUDGET, rules_player=None,
+          max_entries=MAX_ENTRIES):
+    """
+    Solve the position on board with color to move.
+    Returns (result, move): ("win", proving move), ("loss", PASS)
+    or ("unknown", PASS).
+    The node budget is shared between the two searches.
+    """
+    search = ProofNumberSearch(board, rules_player, max_entries)
+    if search.prove(color, color, node_budget):
+        return "win", search.proving_move(color)
+    remaining = node_budget - search.nodes
+    if remaining > 0:
+        search.table = {}
+        if search.prove(GoBoardUtil.opponent(color), color, remaining):
+            return "loss", PASS
+    return "unknown", PASS
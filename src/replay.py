@@ -0,0 +1,151 @@
+"""
+replay.py
+
+Record a GTP session and replay its searches offline.
+
+Every search seeds the player's random number streams from its own
+seed (see GtpConnection.seed_search), so a search is repeatable from
+the position, the engine settings and that seed. Gomoku3.py --record
+FILE writes the session: a first line with the settings, then a JSON
+line per command with the command, its wall time and, for searches,
+the seed, the move played and the number of playouts run.
+
+Running this file as a script rebuilds the engine from the settings,
+replays every command with the recorded seeds and compares the moves,
+playouts and times of the searches, optionally running one of them
+under cProfile (the GTP profile command) or the command tracer.
+
+Replay is exact for searches bounded by numSimulations. A timeLimit
+or an analyze command stops on the clock, and several search threads
+sharing a RolloutScheduler draw from it in thread order, so those
+searches may differ.
+
+Usage:
+    python Gomoku3.py --record session.jsonl < commands.gtp
+    python replay.py session.jsonl [--profile N] [--profile-out FILE] [--trace]
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+
+
+class Recorder(object):
+    """ Writes the settings and then every command to out as JSON lines """
+    def __init__(self, out, settings):
+        self.out = out
+        self.write({"settings": settings})
+
+    def record(self, command, search, seconds):
+        """
+        Record command, which took seconds. search is the
+        GtpConnection.last_search dict of a search command, or None.
+        """
+        entry = {"command": command, "wall_ms": round(seconds * 1000.0, 3)}
+        if search is not None:
+            entry.update(search)
+        self.write(entry)
+
+    def write(self, entry):
+        self.out.write(json.dumps(entry) + "\n")
+        self.out.flush()
+
+
+def read_record(path):
+    """ Return (settings, entries) of the session recorded in path """
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or "settings" not in lines[0]:
+        raise ValueError("{} is not a session record".format(path))
+    return lines[0]["settings"], lines[1:]
+
+
+def make_connection(settings, tracer=None):
+    """ A GtpConnection set up like the recorded one, writing to a buffer """
+    from Gomoku3 import FlatMCSimPlayer
+    from gtp_connection import GtpConnection
+    from selfplay import apply_config
+    if settings.get("board") == "compact":
+        from compact_board import CompactGoBoard as GoBoard
+    else:
+        from board import GoBoard
+    board = GoBoard(settings.get("size", 7))
+    player = FlatMCSimPlayer(10, board)
+    apply_config(player, settings.get("config", {}))
+    if settings.get("tablebase"):
+        from tablebase import Tablebase
+        player.tablebase = Tablebase(settings["tablebase"])
+    con = GtpConnection(player, board, tracer=tracer, out=io.StringIO())
+    con.policy = settings.get("policy", con.policy)
+    con.search = settings.get("search", False)
+    if settings.get("tuned"):
+        from autotune import TunedConfigs
+        con.tuned = TunedConfigs(**settings["tuned"])
+    return con
+
+
+def replay(settings, entries, profile=None, profile_out=None, tracer=None, log=print):
+    """
+    Replay the recorded commands entries. The profile-th search (from 1)
+    runs under the profile command. Returns the number of searches whose
+    move or playouts differ from the record.
+    """
+    con = make_connection(settings, tracer)
+    con.replay_seeds.extend(entry["seed"] for entry in entries if "seed" in entry)
+    searches = 0
+    mismatches = 0
+    log("{:>4}  {:<16} {:>6} {:>6}  {:>9} {:>9}  {:>10} {:>10}".format(
+        "#", "command", "move", "replay", "playouts", "replay", "ms", "replay"))
+    for entry in entries:
+        command = entry["command"]
+        if command.split()[0] == "quit":
+            break
+        if "seed" in entry:
+            searches += 1
+            if searches == profile:
+                options = "-o {} ".format(profile_out) if profile_out else ""
+                command = "profile " + options + command
+        start = time.perf_counter()
+        con.get_cmd(command)
+        wall_ms = (time.perf_counter() - start) * 1000.0
+        if "seed" not in entry:
+            continue
+        search = con.last_search or {}
+        same = search.get("move") == entry.get("move") and \
+            search.get("playouts") == entry.get("playouts")
+        if not same:
+            mismatches += 1
+        log("{:>4}  {:<16} {:>6} {:>6}  {:>9} {:>9}  {:>10.1f} {:>10.1f}{}".format(
+            searches, entry["command"], str(entry.get("move")), str(search.get("move")),
+            str(entry.get("playouts")), str(search.get("playouts")),
+            entry["wall_ms"], wall_ms, "" if same else "  MISMATCH"))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded GTP session")
+    parser.add_argument("record", help="session written by Gomoku3.py --record")
+    parser.add_argument("--profile", type=int, metavar="N",
+                        help="run the N-th search (from 1) under cProfile")
+    parser.add_argument("--profile-out", metavar="FILE",
+                        help="write the profile to FILE instead of stderr")
+    parser.add_argument("--trace", action="store_true",
+                        help="time every command and print the tracer summary")
+    args = parser.parse_args()
+    settings, entries = read_record(args.record)
+    tracer = None
+    if args.trace:
+        from gtp_trace import CommandTracer
+        tracer = CommandTracer()
+    mismatches = replay(settings, entries, args.profile, args.profile_out, tracer)
+    if tracer is not None:
+        print(tracer.summary())
+    if mismatches:
+        print("{} searches differ from the record".format(mismatches))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
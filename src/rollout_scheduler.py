@@ -0,0 +1,282 @@
+"""
+rollout_scheduler.py
+
+Central rollout scheduler shared by all searches in one process.
+
+Searches running in different threads submit rollout requests
+(a position and a number of playouts). The scheduler packs the pending
+requests into one (boards x points) NumPy batch, plays moves on all
+boards at once and routes the finished results back to each caller.
+Rollouts use either random moves or the rule-based policy, computed for
+the whole batch by rule_policy.batched_rule_moves.
+"""
+
+import threading
+import numpy as np
+from board_util import (
+    GoBoardUtil,
+    BLACK,
+    WHITE,
+    EMPTY,
+    BORDER,
+    WIN_CONDITION
+)
+from rule_policy import batched_rule_moves
+
+"""
+Result codes used inside a batch.
+"""
+UNKNOWN = 0
+DRAW = 3
+RESULT_NAMES = {BLACK: "black", WHITE: "white", DRAW: "draw"}
+
+
+class RolloutRequest(object):
+    """
+    A request for count rollouts with policy from one position.
+    The stats dict is filled in by the scheduler, done is set once
+    all rollouts have finished, or once a batch holding some of them
+    has failed, with the exception in error.
+    """
+    def __init__(self, board, to_play, count, policy="random"):
+        self.board = np.array(board.board, dtype=np.int8)
+        self.size = board.size
+        self.to_play = to_play
+        self.count = count
+        self.policy = policy
+        self.submitted = 0
+        self.finished = 0
+        self.stats = {"black": 0, "white": 0, "draw": 0}
+        self.error = None
+        self.done = threading.Event()
+
+
+def axis_increments(size):
+    """ One increment per line axis (N-S, E-W, NE-SW, SE-NW) """
+    return [size + 1, 1, size, size + 2]
+
+
+def play_rollouts(boards, to_play, size, rng, policy="random"):
+    """
+    Play rollouts on a batch of boards until each one is decided.
+
+    Arguments
+    ---------
+    boards : np.array
+        (B, maxpoint) array of board arrays, modified in place.
+    to_play : np.array
+        (B,) colors to move on each board.
+    size : int
+        the board size shared by all boards in the batch.
+    rng : np.random.Generator
+    policy : 'random' or 'rule'
+
+    Returns
+    -------
+    (B,) array of result codes BLACK, WHITE or DRAW
+    """
+    num_boards, maxpoint = boards.shape
+    to_play = np.array(to_play, dtype=np.int8)
+    result = np.full(num_boards, UNKNOWN, dtype=np.int8)
+    active = np.arange(num_boards)
+    incs = axis_increments(size)
+    while active.size > 0:
+        sub = boards[active]
+        if policy == "rule":
+            moves, rules = batched_rule_moves(sub, to_play[active], size, rng)
+            full = moves < 0
+        else:
+            keys = rng.random(sub.shape)
+            keys[sub != EMPTY] = -1.0
+            moves = keys.argmax(axis=1)
+            full = keys[np.arange(active.size), moves] < 0
+        result[active[full]] = DRAW
+        active = active[~full]
+        moves = moves[~full]
+        colors = to_play[active]
+        boards[active, moves] = colors
+        won = five_in_row(boards, active, moves, colors, incs)
+        result[active[won]] = colors[won]
+        to_play[active] = GoBoardUtil.opponent(colors)
+        active = active[~won]
+    return result
+
+
+def five_in_row(boards, rows, moves, colors, incs):
+    """
+    For each board in rows, check whether the stone of colors just
+    played on moves completes a line of WIN_CONDITION stones.
+    """
+    maxpoint = boards.shape[1]
+    won = np.zeros(rows.size, dtype=bool)
+    for axis in incs:
+        count = np.zeros(rows.size, dtype=np.int8)
+        for inc in (axis, -axis):
+            run = np.ones(rows.size, dtype=bool)
+            for k in range(1, WIN_CONDITION):
+                points = moves + k * inc
+                inside = (points >= 0) & (points < maxpoint)
+                points = np.clip(points, 0, maxpoint - 1)
+                point_colors = np.where(inside, boards[rows, points], BORDER)
+                run &= (point_colors == colors)
+                count += run
+        won |= (count >= WIN_CONDITION - 1)
+    return won
+
+
+class RolloutScheduler(object):
+    """
+    Collects rollout requests from concurrent searches and evaluates them
+    together in large batches on a background thread.
+    """
+    def __init__(self, batch_size=1024, seed=None):
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+        self.pending = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.thread = None
+        self.running = False
+        self.batches = 0
+        self.rollouts = 0
+
+    def seed(self, seed):
+        """ Restart the random number stream of the rollouts from seed """
+        with self.lock:
+            self.rng = np.random.default_rng(seed)
+
+    def start(self):
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.wakeup.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def rollout(self, board, to_play, count, policy="random"):
+        """
+        Run count rollouts with policy ('random' or 'rule') from the
+        position on board with to_play to move. Blocks until all of them
+        are finished and returns the stats dict {'black', 'white', 'draw'}.
+        If a batch with some of the rollouts fails, its exception is
+        raised here.
+        """
+        request = RolloutRequest(board, to_play, count, policy)
+        if count <= 0:
+            return request.stats
+        if not self.running:
+            self.start()
+        with self.lock:
+            self.pending.append(request)
+            self.wakeup.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.stats
+
+    def _next_batch(self):
+        """
+        Take up to batch_size rollouts off the pending requests.
+        All rollouts in a batch use the same board size and policy.
+        Returns a list of (request, number of rollouts).
+        """
+        batch = []
+        room = self.batch_size
+        size = self.pending[0].size
+        policy = self.pending[0].policy
+        for request in self.pending:
+            if room == 0:
+                break
+            if request.size != size or request.policy != policy:
+                continue
+            n = min(request.count - request.submitted, room)
+            request.submitted += n
+            room -= n
+            batch.append((request, n))
+        self.pending = [r for r in self.pending if r.submitted < r.count]
+        return batch
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while self.running and not self.pending:
+                    self.wakeup.wait()
+                if not self.running:
+                    return
+                batch = self._next_batch()
+            try:
+                self.run_batch(batch)
+            except Exception as e:
+                self.fail_batch(batch, e)
+
+    def fail_batch(self, batch, error):
+        """
+        Fail every request in batch with error: drop the rest of their
+        rollouts and wake up their callers, who raise error.
+        """
+        with self.lock:
+            for request, n in batch:
+                request.error = error
+            self.pending = [r for r in self.pending if r.error is None]
+        for request, n in batch:
+            request.done.set()
+
+    def run_batch(self, batch):
+        boards = np.concatenate(
+            [np.broadcast_to(req.board, (n, req.board.size)) for req, n in batch]
+        )
+        to_play = np.concatenate(
+            [np.full(n, req.to_play, dtype=np.int8) for req, n in batch]
+        )
+        first = batch[0][0]
+        results = play_rollouts(boards, to_play, first.size, self.rng, first.policy)
+        start = 0
+        for request, n in batch:
+            codes = np.bincount(results[start:start + n], minlength=DRAW + 1)
+            for code, name in RESULT_NAMES.items():
+                request.stats[name] += int(codes[code])
+            start += n
+            request.finished += n
+            if request.finished == request.count:
+                request.done.set()
+        self.batches += 1
+        self.rollouts += start
+
+
+def benchmark(num_games=8, playouts=200, size=7, policy="random"):
+    """
+    Measure rollouts per second for num_games concurrent searches
+    sharing one scheduler.
+    """
+    import time
+    from board import GoBoard
+    scheduler = RolloutScheduler()
+    scheduler.start()
+    boards = [GoBoard(size) for _ in range(num_games)]
+    threads = [
+        threading.Thread(target=scheduler.rollout, args=(b, BLACK, playouts, policy))
+        for b in boards
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    scheduler.stop()
+    return num_games * playouts / elapsed
+
+
+if __name__ == "__main__":
+    for policy in ("random", "rule"):
+        for games in (1, 4, 16, 64):
+            print("{:6s} {:3d} games: {:9.0f} rollouts/s".format(
+                policy, games, benchmark(games, policy=policy)))
@@ -0,0 +1,181 @@
+"""
+rule_policy.py
+
+The rule-based policy of FlatMCSimPlayer.rules() computed with numpy
+array operations for a whole batch of boards at once.
+
+For every empty point of every board, the scans of line_rule along the
+8 directions are done on precomputed rays of points, and the point gets
+the best rule it satisfies on any of the 4 lines through it:
+
+    WIN < BLOCK_WIN < OPEN_FOUR < BLOCK_OPEN_FOUR < RANDOM
+
+Each board then plays a random point of its best rule, exactly like
+get_rule_move picks a random move of the first non-empty bucket.
+"""
+
+import numpy as np
+from board_util import EMPTY, BORDER, GoBoardUtil
+
+"""
+Rule codes, in priority order, and their names in rules().
+"""
+WIN = 1
+BLOCK_WIN = 2
+OPEN_FOUR = 3
+BLOCK_OPEN_FOUR = 4
+RANDOM = 5
+RULE_NAMES = {WIN: "Win", BLOCK_WIN: "BlockWin", OPEN_FOUR: "OpenFour",
+              BLOCK_OPEN_FOUR: "BlockOpenFour", RANDOM: "Random"}
+
+"""
+The line pairs checked by rules(), first direction first.
+"""
+LINES = [["N", "S"], ["NE", "SW"], ["E", "W"], ["SE", "NW"]]
+
+_rays = {}
+
+
+def get_rays(size):
+    """
+    Return (on_board, rays) for boards of size size.
+    on_board is the array of the size * size board points.
+    rays maps each direction to a (size * size, size + 2) array of
+    points: entry [i, k] is the point k + 1 steps from on_board[i] in
+    that direction. Points that fall off the array are replaced by
+    point 0, which is always BORDER. The rays are views of the
+    table_cache table, shared with other processes when it is mapped
+    from the cache file.
+    """
+    rays = _rays.get(size)
+    if rays is None:
+        from table_cache import get_table, DIRECTIONS
+        NS = size + 1
+        on_board = np.array([row * NS + col for row in range(1, size + 1)
+                             for col in range(1, size + 1)])
+        points = np.frombuffer(get_table(size, "rays"), dtype=np.intc).reshape(
+            len(DIRECTIONS), size * size, size + 2)
+        rays = (on_board, dict(zip(DIRECTIONS, points)))
+        _rays[size] = rays
+    return rays
+
+
+def _run_lengths(is_color):
+    """
+    For a boolean (..., K) array, the number of consecutive True
+    entries starting at each position along the last axis.
+    """
+    runs = is_color.astype(np.int8)
+    for k in range(is_color.shape[-1] - 2, -1, -1):
+        runs[..., k] *= runs[..., k + 1] + 1
+    return runs
+
+
+def _take(values, index):
+    """ values[..., index] for an index array of the leading shape """
+    index = np.minimum(index, values.shape[-1] - 1)
+    return np.take_along_axis(values, index[..., None].astype(np.intp), axis=-1)[..., 0]
+
+
+def _scan(cells, mine_color, their_color):
+    """
+    One side of line_rule for every point at once.
+    cells is the (B, N, K) array of colors along the rays of the N
+    board points, mine_color and their_color are (B, 1) arrays.
+    Returns (mine, theirs, open, block_open_four) arrays of shape
+    (B, N), with the same values as the l_/r_ counters and the
+    block_open_four flag set by the scan in line_rule.
+    """
+    mine_color = mine_color[..., None]
+    their_color = their_color[..., None]
+    is_mine = cells == mine_color
+    is_theirs = cells == their_color
+    mine_runs = _run_lengths(is_mine)
+    their_runs = _run_lengths(is_theirs)
+
+    first = cells[..., 0]
+    first_mine = is_mine[..., 0]
+    first_theirs = is_theirs[..., 0]
+    first_empty = first == EMPTY
+    run = np.where(first_mine, mine_runs[..., 0],
+                   np.where(first_theirs, their_runs[..., 0], 0))
+    # the point that ended the run of stones
+    end = _take(cells, run)
+    mine = np.where(first_mine, run, 0) + (first_theirs & (end == mine_color[..., 0]))
+    theirs = np.where(first_theirs, run, 0) + (first_mine & (end == their_color[..., 0]))
+    opened = first_empty | ((first_mine | first_theirs) & (end == EMPTY))
+
+    # their stones, a gap, then more of their stones: X X _ X _
+    gap = first_theirs & (end == EMPTY) & (run <= 3)
+    outer = _take(their_runs, run + 1)
+    after = _take(cells, run + 1 + outer)
+    block_open_four = gap & (after == EMPTY) & (run + outer == 3)
+
+    # a gap, three of their stones, a gap and then one of ours or the edge
+    outer = their_runs[..., 1]
+    after = _take(cells, 1 + outer)
+    beyond = _take(cells, 2 + outer)
+    block_open_four |= first_empty & (outer == 3) & (after == EMPTY) & \
+        ((beyond == mine_color[..., 0]) | (beyond == BORDER))
+    return mine, theirs, opened, block_open_four
+
+
+def rule_codes(boards, colors, size):
+    """
+    Rule code of every point for the player colors[i] on boards[i].
+    boards is a (B, maxpoint) array, colors a (B,) array.
+    Returns a (B, maxpoint) array; points that are not empty get
+    RANDOM + 1.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    colors = np.asarray(colors, dtype=np.int8).reshape(-1, 1)
+    opponents = GoBoardUtil.opponent(colors)
+    on_board, rays = get_rays(size)
+    codes = np.full((boards.shape[0], on_board.size), RANDOM, dtype=np.int8)
+    scans = {}
+    for direction, points in rays.items():
+        scans[direction] = _scan(boards[:, points], colors, opponents)
+    for first, second in LINES:
+        l_mine, l_theirs, l_open, l_bof = scans[first]
+        r_mine, r_theirs, r_open, r_bof = scans[second]
+        mine = l_mine + r_mine
+        theirs = l_theirs + r_theirs
+        opened = l_open.astype(np.int8) + r_open
+        line = np.full(codes.shape, RANDOM, dtype=np.int8)
+        line[l_bof | r_bof | ((theirs == 3) & (opened == 2))] = BLOCK_OPEN_FOUR
+        line[(mine == 3) & (opened == 2)] = OPEN_FOUR
+        line[theirs >= 4] = BLOCK_WIN
+        line[mine >= 4] = WIN
+        np.minimum(codes, line, out=codes)
+    all_codes = np.full(boards.shape, RANDOM + 1, dtype=np.int8)
+    all_codes[:, on_board] = np.where(boards[:, on_board] == EMPTY, codes, RANDOM + 1)
+    return all_codes
+
+
+def batched_rule_moves(boards, colors, size, rng):
+    """
+    Choose one move per board with the rule-based policy.
+
+    Arguments
+    ---------
+    boards : np.array
+        (B, maxpoint) board arrays.
+    colors : np.array
+        (B,) colors to play.
+    size : int
+        the board size shared by all boards.
+    rng : np.random.Generator
+
+    Returns
+    -------
+    (moves, rules): (B,) arrays of the chosen points and their rule
+    codes. Boards without an empty point get move -1 and rule
+    RANDOM + 1.
+    """
+    codes = rule_codes(boards, colors, size)
+    best = codes.min(axis=1)
+    keys = rng.random(codes.shape)
+    keys[codes != best[:, None]] = -1.0
+    moves = keys.argmax(axis=1)
+    moves[best > RANDOM] = -1
+    return moves, best
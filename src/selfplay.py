@@ -0,0 +1,194 @@
+"""
+selfplay.py
+
+Play games between two engine configurations with the GoBoard and
+FlatMCSimPlayer stack.
+
+An engine config is a dict of FlatMCSimPlayer settings:
+    numSimulations   playouts per move (default 10)
+    policy           "random" or "rule" (default "random")
+    amaf             None, "amaf" or "rave"
+    threads          search threads (default 1)
+    rolloutDepth     cut playouts off after this many moves (default None)
+    timeLimit        seconds per move (default None)
+    batchSize        run playouts through a RolloutScheduler with this
+                     batch size (default None, no scheduler)
+    roundSize        playouts per move between early stopping checks
+                     (default 1)
+    confidence       error probability of statistical early stopping
+                     (default None)
+    raveEquivalence  RAVE equivalence parameter (default 100)
+
+Run as a script to play a match between two configs, e.g. truncated
+against full rollouts at equal time per move:
+    python selfplay.py --games 20 --size 9 \
+        --a '{"numSimulations": 100000, "timeLimit": 1, "rolloutDepth": 6}' \
+        --b '{"numSimulations": 100000, "timeLimit": 1}'
+"""
+
+import argparse
+import json
+import random
+import time
+from board_util import GoBoardUtil, BLACK, WHITE, PASS, WIN_CONDITION
+from gtp_connection import point_tables
+
+
+_schedulers = {}
+
+
+def make_player(config, board, seed=None):
+    """ A FlatMCSimPlayer set up from the engine config dict """
+    from Gomoku3 import FlatMCSimPlayer
+    player = FlatMCSimPlayer(10, board)
+    apply_config(player, config)
+    player.seed(seed)
+    return player
+
+
+def apply_config(player, config):
+    """
+    Set the search settings of player from the engine config dict.
+    Players with the same batchSize share one RolloutScheduler; a
+    treeNodes entry gives the player a NodeStore of that many nodes for
+    the tree search, kept as long as the size stays the same.
+    The policy is not a player setting; it is passed to startSimulation.
+    Raises ValueError for a numSimulations or roundSize below 1.
+    """
+    for key in ("numSimulations", "roundSize"):
+        if config.get(key, 1) < 1:
+            raise ValueError("{} must be at least 1, not {}".format(key, config[key]))
+    player.numSimulations = config.get("numSimulations", 10)
+    player.amaf = config.get("amaf")
+    player.threads = config.get("threads", 1)
+    player.rolloutDepth = config.get("rolloutDepth")
+    player.timeLimit = config.get("timeLimit")
+    player.roundSize = config.get("roundSize", 1)
+    player.confidence = config.get("confidence")
+    player.raveEquivalence = config.get("raveEquivalence", 100)
+    tree_nodes = config.get("treeNodes")
+    if tree_nodes is None:
+        player.tree = None
+    elif player.tree is None or player.tree.capacity != tree_nodes:
+        from node_store import NodeStore
+        player.tree = NodeStore(tree_nodes)
+        player.treeRoot = None
+    batch_size = config.get("batchSize")
+    if batch_size is None:
+        player.scheduler = None
+    else:
+        if batch_size not in _schedulers:
+            from rollout_scheduler import RolloutScheduler
+            _schedulers[batch_size] = RolloutScheduler(batch_size)
+        player.scheduler = _schedulers[batch_size]
+
+
+def player_config(player):
+    """ The engine config dict of player, the inverse of apply_config """
+    config = {
+        "numSimulations": player.numSimulations,
+        "amaf": player.amaf,
+        "threads": player.threads,
+        "rolloutDepth": player.rolloutDepth,
+        "timeLimit": player.timeLimit,
+        "roundSize": player.roundSize,
+        "confidence": player.confidence,
+        "raveEquivalence": player.raveEquivalence,
+    }
+    if player.scheduler is not None:
+        config["batchSize"] = player.scheduler.batch_size
+    if player.tree is not None:
+        config["treeNodes"] = player.tree.capacity
+    return config
+
+
+def play_game(size, black, white, seed=None, board_class=None):
+    """
+    Play one game between the engine configs black and white.
+    Returns the game record: a dict with the size, both configs, the
+    seed, the moves as GTP strings, the result ("black", "white" or
+    "draw"), the total time taken and, per color, the search time and
+    the number of playouts.
+    """
+    if board_class is None:
+        from board import GoBoard as board_class
+    rng = random.Random(seed)
+    board = board_class(size)
+    players = {BLACK: make_player(black, board, rng.getrandbits(64)),
+               WHITE: make_player(white, board, rng.getrandbits(64))}
+    configs = {BLACK: black, WHITE: white}
+    point_to_str = point_tables(size)[0]
+    moves = []
+    result = "unknown"
+    color = BLACK
+    seconds = {BLACK: 0.0, WHITE: 0.0}
+    while result == "unknown":
+        player = players[color]
+        board.current_player = color
+        start = time.perf_counter()
+        move = player.startSimulation(board, "b" if color == BLACK else "w",
+                                      configs[color].get("policy", "random"))
+        seconds[color] += time.perf_counter() - start
+        if move == PASS:
+            result = "draw"
+            break
+        board.play_move(move, color)
+        moves.append(point_to_str[move].lower())
+        result = board.get_result(color, move, WIN_CONDITION)
+        color = GoBoardUtil.opponent(color)
+    return {
+        "size": size,
+        "black": black,
+        "white": white,
+        "seed": seed,
+        "moves": moves,
+        "result": result,
+        "time": round(seconds[BLACK] + seconds[WHITE], 3),
+        "seconds": {"black": round(seconds[BLACK], 3),
+                    "white": round(seconds[WHITE], 3)},
+        "playouts": {"black": players[BLACK].playouts,
+                     "white": players[WHITE].playouts},
+    }
+
+
+def match(games, size, a, b, seed=0):
+    """
+    Play games between the engine configs a and b, swapping colors after
+    every game. Returns (score of a, playouts per second of a, of b),
+    where the score counts draws as half a win.
+    """
+    score = 0.0
+    playouts = {"a": 0, "b": 0}
+    seconds = {"a": 0.0, "b": 0.0}
+    for i in range(games):
+        black, white = ("a", "b") if i % 2 == 0 else ("b", "a")
+        configs = {"a": a, "b": b}
+        record = play_game(size, configs[black], configs[white], seed + i)
+        if record["result"] == "draw":
+            score += 0.5
+        elif record["result"] == ("black" if black == "a" else "white"):
+            score += 1.0
+        for name, color in ((black, "black"), (white, "white")):
+            playouts[name] += record["playouts"][color]
+            seconds[name] += record["seconds"][color]
+    rate = {name: playouts[name] / seconds[name] if seconds[name] else 0.0
+            for name in playouts}
+    return score, rate["a"], rate["b"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match two engine configs")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--size", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--a", type=json.loads, default={})
+    parser.add_argument("--b", type=json.loads, default={})
+    args = parser.parse_args()
+    score, rate_a, rate_b = match(args.games, args.size, args.a, args.b, args.seed)
+    print("a scored {:.1f} / {} ({:.0f}%)".format(score, args.games,
+                                                  100.0 * score / args.games))
+    print("playouts/s: a {:.0f}, b {:.0f}".format(rate_a, rate_b))
+
+
+if __name__ == "__main__":
+    main()
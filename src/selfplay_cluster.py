@@ -0,0 +1,242 @@
+"""
+selfplay_cluster.py
+
+Distribute self-play games over worker processes on any number of hosts.
+
+The coordinator holds a queue of game jobs (board size, the two engine
+configs and a seed) and listens on a TCP port. Workers connect, receive
+one job at a time, play it with selfplay.play_game and send the game
+record back. The coordinator writes each record as a JSON line to the
+output file as it arrives. If a worker disconnects or does not report
+back within the job timeout, its job goes back to the queue and is
+given to another worker; a record that arrives twice is written once.
+
+Protocol, one JSON object per line:
+    worker -> coordinator  {"type": "hello", "worker": NAME}
+    coordinator -> worker  {"type": "job", "job": JOB} or {"type": "done"}
+    worker -> coordinator  {"type": "result", "id": JOB_ID, "record": RECORD}
+
+Usage:
+    python selfplay_cluster.py coordinator --games N [--size 7] [--port 5055]
+        [--out games.jsonl] [--black CONFIG] [--white CONFIG]
+        [--local-workers K]
+    python selfplay_cluster.py worker [--host HOST] [--port 5055]
+
+CONFIG is a JSON engine config, see selfplay.py. With --local-workers,
+the coordinator starts K worker processes on this machine itself.
+Each game swaps the colors of the two configs from the previous one.
+"""
+
+import argparse
+import collections
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+
+DEFAULT_PORT = 5055
+
+"""
+Seconds a worker may take for one game before its job is reassigned.
+"""
+JOB_TIMEOUT = 600
+
+
+class Coordinator(object):
+    def __init__(self, jobs, out, job_timeout=JOB_TIMEOUT):
+        self.pending = collections.deque(jobs)
+        self.total = len(self.pending)
+        self.out = out
+        self.job_timeout = job_timeout
+        self.assigned = {}
+        self.done = set()
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.finished = threading.Event()
+        if self.total == 0:
+            self.finished.set()
+
+    def next_job(self):
+        """
+        Take the next job off the queue. While jobs are still out with
+        other workers, wait, since one of them may come back.
+        Returns None once all jobs are done.
+        """
+        with self.lock:
+            while not self.pending and not self.finished.is_set():
+                self.changed.wait()
+            if self.finished.is_set():
+                return None
+            job = self.pending.popleft()
+            self.assigned[job["id"]] = job
+            return job
+
+    def complete(self, job_id, record):
+        with self.lock:
+            if job_id in self.done:
+                return
+            self.done.add(job_id)
+            self.assigned.pop(job_id, None)
+            record = dict(record, id=job_id)
+            self.out.write(json.dumps(record) + "\n")
+            self.out.flush()
+            if len(self.done) == self.total:
+                self.finished.set()
+            self.changed.notify_all()
+
+    def release(self, job):
+        """ Put the job of a lost worker back at the front of the queue """
+        with self.lock:
+            if job["id"] in self.assigned and job["id"] not in self.done:
+                del self.assigned[job["id"]]
+                self.pending.appendleft(job)
+                self.changed.notify_all()
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    def send(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode())
+        self.wfile.flush()
+
+    def receive(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("worker disconnected")
+        return json.loads(line)
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        self.request.settimeout(coordinator.job_timeout)
+        try:
+            self.receive()
+        except (OSError, ValueError):
+            return
+        while True:
+            job = coordinator.next_job()
+            if job is None:
+                try:
+                    self.send({"type": "done"})
+                except OSError:
+                    pass
+                return
+            try:
+                self.send({"type": "job", "job": job})
+                # a result for another job is a repeated or late one: it is
+                # recorded unless it already is, and the job sent stays open
+                while True:
+                    message = self.receive()
+                    coordinator.complete(message["id"], message["record"])
+                    if message["id"] == job["id"]:
+                        break
+            except (OSError, ValueError, KeyError):
+                coordinator.release(job)
+                return
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, coordinator):
+        self.coordinator = coordinator
+        socketserver.ThreadingTCPServer.__init__(self, address, WorkerHandler)
+
+
+def make_jobs(games, size, black, white, seed=0):
+    jobs = []
+    for i in range(games):
+        first, second = (black, white) if i % 2 == 0 else (white, black)
+        jobs.append({"id": i, "size": size, "black": first, "white": second,
+                     "seed": seed + i})
+    return jobs
+
+
+def run_coordinator(jobs, out, host="", port=DEFAULT_PORT, local_workers=0,
+                    job_timeout=JOB_TIMEOUT, on_listen=None):
+    """
+    Serve jobs until every one of them has a record in out.
+    on_listen, if given, is called with the port once the server
+    accepts workers, before the local workers are started; with port 0
+    it is the way to learn the port picked.
+    Returns the number of records written.
+    """
+    coordinator = Coordinator(jobs, out, job_timeout)
+    server = CoordinatorServer((host, port), coordinator)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    if on_listen is not None:
+        on_listen(port)
+    processes = [subprocess.Popen([sys.executable, __file__, "worker",
+                                   "--host", "127.0.0.1", "--port", str(port)])
+                 for i in range(local_workers)]
+    coordinator.finished.wait()
+    server.shutdown()
+    server.server_close()
+    for process in processes:
+        process.wait()
+    return len(coordinator.done)
+
+
+def run_worker(host, port, name=None, max_games=None):
+    """
+    Play jobs from the coordinator at host:port until it has no more.
+    max_games makes the worker quit after that many games, leaving the
+    next job it receives unfinished (used to test reassignment).
+    """
+    from selfplay import play_game
+    name = name or "{}:{}".format(socket.gethostname(), os.getpid())
+    with socket.create_connection((host, port)) as sock:
+        rfile = sock.makefile("r")
+        wfile = sock.makefile("w")
+        wfile.write(json.dumps({"type": "hello", "worker": name}) + "\n")
+        wfile.flush()
+        played = 0
+        for line in rfile:
+            message = json.loads(line)
+            if message["type"] != "job" or played == max_games:
+                break
+            job = message["job"]
+            record = play_game(job["size"], job["black"], job["white"], job["seed"])
+            record["worker"] = name
+            wfile.write(json.dumps({"type": "result", "id": job["id"],
+                                    "record": record}) + "\n")
+            wfile.flush()
+            played += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed Gomoku self-play")
+    sub = parser.add_subparsers(dest="role", required=True)
+    coord = sub.add_parser("coordinator")
+    coord.add_argument("--games", type=int, required=True)
+    coord.add_argument("--size", type=int, default=7)
+    coord.add_argument("--seed", type=int, default=0)
+    coord.add_argument("--host", default="")
+    coord.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coord.add_argument("--out", default="-")
+    coord.add_argument("--black", type=json.loads, default={})
+    coord.add_argument("--white", type=json.loads, default={})
+    coord.add_argument("--local-workers", type=int, default=0)
+    coord.add_argument("--job-timeout", type=float, default=JOB_TIMEOUT)
+    work = sub.add_parser("worker")
+    work.add_argument("--host", default="127.0.0.1")
+    work.add_argument("--port", type=int, default=DEFAULT_PORT)
+    work.add_argument("--name")
+    work.add_argument("--max-games", type=int)
+    args = parser.parse_args()
+
+    if args.role == "coordinator":
+        out = sys.stdout if args.out == "-" else open(args.out, "a")
+        jobs = make_jobs(args.games, args.size, args.black, args.white, args.seed)
+        run_coordinator(jobs, out, args.host, args.port, args.local_workers,
+                        args.job_timeout)
+    else:
+        run_worker(args.host, args.port, args.name, args.max_games)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+shared_stats.py
+
+Root move statistics for multi-process search, kept in
+multiprocessing.shared_memory instead of being sent back through queues.
+
+The shared block holds two float64 arrays of shape (workers, moves):
+visits and wins (a draw counts as half a win). Every worker writes only
+its own row, so no locks are needed. Workers keep local counts and add
+them to their row in batches. The parent sums the rows whenever it
+likes, so a best move is available at any time during the search.
+"""
+
+import random
+import numpy as np
+from multiprocessing import shared_memory
+
+"""
+Number of playouts a worker buffers before writing to shared memory.
+"""
+FLUSH_EVERY = 32
+
+
+class SharedStats(object):
+    def __init__(self, num_moves, num_workers, name=None):
+        """
+        Create a new shared block, or attach to the existing block name.
+        """
+        self.num_moves = num_moves
+        self.num_workers = num_workers
+        nbytes = 2 * num_workers * num_moves * np.dtype(np.float64).itemsize
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        arrays = np.ndarray((2, num_workers, num_moves), dtype=np.float64,
+                            buffer=self.shm.buf)
+        if self.owner:
+            arrays[:] = 0
+        self.visits = arrays[0]
+        self.wins = arrays[1]
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def add(self, worker, visits, wins):
+        """
+        Add a batch of per-move visits and wins to the row of worker.
+        Visits are written before wins, so a concurrent reader can
+        underestimate a win rate but never see it above 1.
+        """
+        self.visits[worker] += visits
+        self.wins[worker] += wins
+
+    def totals(self):
+        """
+        Return (visits, wins) summed over all workers. Wins are read
+        before visits, the reverse of the order add writes them in.
+        """
+        wins = self.wins.sum(axis=0)
+        visits = self.visits.sum(axis=0)
+        return visits, wins
+
+    def win_rates(self):
+        visits, wins = self.totals()
+        return np.divide(wins, visits, out=np.zeros_like(wins), where=visits > 0)
+
+    def best_move_index(self):
+        """ Index of the root move with the highest win rate so far """
+        return int(np.argmax(self.win_rates()))
+
+    def close(self):
+        # drop the numpy views first, the buffer cannot be closed while
+        # they are still exported
+        self.visits = self.wins = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class StatsWriter(object):
+    """
+    Local buffer of one worker's results, flushed to SharedStats in
+    batches of flush_every playouts.
+    """
+    def __init__(self, stats, worker, flush_every=FLUSH_EVERY):
+        self.stats = stats
+        self.worker = worker
+        self.flush_every = flush_every
+        self.visits = np.zeros(stats.num_moves)
+        self.wins = np.zeros(stats.num_moves)
+        self.pending = 0
+
+    def record(self, move_index, win):
+        self.visits[move_index] += 1
+        self.wins[move_index] += win
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.stats.add(self.worker, self.visits, self.wins)
+            self.visits[:] = 0
+            self.wins[:] = 0
+            self.pending = 0
+
+
+def search_worker(name, num_workers, worker, board, moves, color, playouts,
+                  policy, seed):
+    """
+    Process entry point: run playouts for every move in moves and
+    record them in the shared block name.
+    """
+    from Gomoku3 import FlatMCSimPlayer
+    stats = SharedStats(len(moves), num_workers, name)
+    writer = StatsWriter(stats, worker)
+    player = FlatMCSimPlayer(playouts, board)
+    player.rng = random.Random(seed)
+    for i in range(playouts):
+        for move_index, move in enumerate(moves):
+            board.play_move(move, color)
+            result = player.playout(move, color, policy)
+            board.undo_move(move)
+            writer.record(move_index, player.result_score(result, color))
+    writer.flush()
+    stats.close()
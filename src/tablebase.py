@@ -0,0 +1,237 @@
+"""
+tablebase.py
+
+Endgame tablebase of exactly solved positions with few empty points.
+
+Generation: enumerating every position with at most k empty points is
+out of reach even on 7x7 (there are about 10^18 with 6 empty points),
+so the generator solves the positions that games actually reach. It
+plays random games, or replays the games of a selfplay.py record file,
+and at the first position with at most k empty points solves the whole
+game tree below it by negamax. Every position met in these trees is
+stored with its exact value.
+
+Keys are canonical under the 8 symmetries of the board: the smallest
+over all symmetries of (black bitmask << size * size) | white bitmask,
+with bit 2 * size * size set when white is to play. The file holds a
+header and the records sorted by key, each a big-endian key of
+key_bytes(size) bytes and a signed value byte: 1 if the side to play
+wins, 0 for a draw, -1 if it loses. The engine memory-maps the file
+and probes it by binary search.
+
+Usage:
+    python tablebase.py --size 7 --empty 6 --games 500 --out tb7.bin
+    python tablebase.py --size 7 --empty 6 --records games.jsonl --out tb7.bin
+"""
+
+import argparse
+import json
+import mmap
+import random
+import struct
+from board_util import GoBoardUtil, BLACK, WHITE, EMPTY, WIN_CONDITION
+
+MAGIC = b"GMKTB"
+VERSION = 2
+HEADER = struct.Struct("<5sBHHQ")
+
+_symmetries = {}
+
+
+def get_symmetries(size):
+    """
+    Return (points, bits) for boards of size size: the on-board points
+    in row order, and for each of the 8 symmetries the list of the bit
+    (1 << index) that the point with that index moves to.
+    The permutations are read from table_cache.
+    """
+    tables = _symmetries.get(size)
+    if tables is None:
+        from table_cache import get_table
+        n = size
+        points = [row * (n + 1) + col for row in range(1, n + 1) for col in range(1, n + 1)]
+        permutations = get_table(size, "symmetries")
+        bits = [[1 << index for index in permutations[t * n * n:(t + 1) * n * n]]
+                for t in range(8)]
+        tables = (points, bits)
+        _symmetries[size] = tables
+    return tables
+
+
+def key_bytes(size):
+    """ Bytes per key for board size size: two bitmasks and the side bit """
+    return (2 * size * size + 1 + 7) // 8
+
+
+def position_key(board, to_play):
+    """ Canonical key of the position on board with to_play to play """
+    points, bits = get_symmetries(board.size)
+    shift = board.size * board.size
+    cells = board.board
+    black = [i for i, p in enumerate(points) if cells[p] == BLACK]
+    white = [i for i, p in enumerate(points) if cells[p] == WHITE]
+    key = min((sum(b[i] for i in black) << shift) | sum(b[i] for i in white)
+              for b in bits)
+    if to_play == WHITE:
+        key |= 1 << (2 * shift)
+    return key
+
+
+def count_empty(board):
+    points = get_symmetries(board.size)[0]
+    cells = board.board
+    return sum(1 for p in points if cells[p] == EMPTY)
+
+
+class Tablebase(object):
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.max_empty, self.count = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} tablebase".format(path, VERSION))
+        self.key_bytes = key_bytes(self.size)
+        self.record_size = self.key_bytes + 1
+        if len(self.data) != HEADER.size + self.count * self.record_size:
+            raise ValueError("{} is truncated or corrupt".format(path))
+        self.hits = 0
+        self.probes = 0
+
+    def lookup(self, key):
+        """ Value stored for key, or None """
+        width = self.key_bytes
+        key = key.to_bytes(width, "big")
+        data = self.data
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = HEADER.size + mid * self.record_size
+            found = data[start:start + width]
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return struct.unpack_from("b", data, start + width)[0]
+        return None
+
+    def probe(self, board, to_play, empty=None):
+        """
+        Exact value of the position for to_play: 1 win, 0 draw, -1 loss.
+        Returns None if the position is not in the table. empty is the
+        number of empty points, if the caller already knows it.
+        """
+        if board.size != self.size:
+            return None
+        if empty is None:
+            empty = count_empty(board)
+        if empty > self.max_empty:
+            return None
+        self.probes += 1
+        value = self.lookup(position_key(board, to_play))
+        if value is not None:
+            self.hits += 1
+        return value
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def solve(board, to_play, table):
+    """
+    Negamax value of the position for to_play (1, 0 or -1), storing it
+    and the values of all positions below it in table by key.
+    """
+    key = position_key(board, to_play)
+    value = table.get(key)
+    if value is not None:
+        return value
+    opponent = GoBoardUtil.opponent(to_play)
+    winner = "black" if to_play == BLACK else "white"
+    value = -1
+    for move in board.get_empty_points().tolist():
+        board.play_move(move, to_play)
+        result = board.get_result(to_play, move, WIN_CONDITION)
+        if result == winner:
+            move_value = 1
+        elif result == "draw":
+            move_value = 0
+        else:
+            move_value = -solve(board, opponent, table)
+        board.undo_move(move)
+        if move_value > value:
+            value = move_value
+            if value == 1:
+                break
+    table[key] = value
+    return value
+
+
+def solve_game(board, moves, max_empty, table, rng=None):
+    """
+    Play moves from the empty board until a position with at most
+    max_empty empty points is reached and solve it into table.
+    A move of None is chosen at random with rng. The board is left
+    empty again.
+    """
+    played = []
+    color = BLACK
+    empty = count_empty(board)
+    for move in moves:
+        if empty <= max_empty:
+            solve(board, color, table)
+            break
+        if move is None:
+            move = GoBoardUtil.generate_random_move(board, color, rng)
+        board.play_move(move, color)
+        played.append(move)
+        empty -= 1
+        if board.get_result(color, move, WIN_CONDITION) != "unknown":
+            break
+        color = GoBoardUtil.opponent(color)
+    for move in played:
+        board.undo_move(move)
+
+
+def write_table(path, size, max_empty, table):
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, size, max_empty, len(table)))
+        width = key_bytes(size)
+        for key in sorted(table):
+            f.write(key.to_bytes(width, "big") + struct.pack("b", table[key]))
+
+
+def main():
+    from board import GoBoard
+    from gtp_connection import point_tables
+    parser = argparse.ArgumentParser(description="Generate an endgame tablebase")
+    parser.add_argument("--size", type=int, default=7)
+    parser.add_argument("--empty", type=int, default=6,
+                        help="solve positions with at most this many empty points")
+    parser.add_argument("--games", type=int, default=0,
+                        help="number of random games to solve the endgames of")
+    parser.add_argument("--records", help="selfplay.py JSONL game records to use")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    board = GoBoard(args.size)
+    table = {}
+    for i in range(args.games):
+        solve_game(board, [None] * (args.size * args.size), args.empty, table, rng)
+    if args.records:
+        str_to_point = point_tables(args.size)[1]
+        with open(args.records) as f:
+            for line in f:
+                record = json.loads(line)
+                if record["size"] == args.size:
+                    solve_game(board, [str_to_point[m] for m in record["moves"]],
+                               args.empty, table)
+    write_table(args.out, args.size, args.empty, table)
+    print("{} positions".format(len(table)))
+
+
+if __name__ == "__main__":
+    main()
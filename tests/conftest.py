@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the engine modules import each other by their flat names from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,29 @@
+import pytest
+
+from batch_analysis import setup_position
+from board import GoBoard
+from board_util import BLACK, WHITE, EMPTY
+
+
+def test_board_field():
+    board, color = setup_position({"size": 5, "board": "X..../.O.../...../...../....x"}, GoBoard)
+    assert board.get_color(board.pt(5, 1)) == BLACK
+    assert board.get_color(board.pt(4, 2)) == WHITE
+    assert board.get_color(board.pt(1, 5)) == BLACK
+    assert board.get_color(board.pt(3, 3)) == EMPTY
+    assert color == WHITE
+
+
+@pytest.mark.parametrize("rows", [
+    "X..../.W.../...../...../.....",
+    "X..../.O.../..-../...../.....",
+])
+def test_board_field_rejects_unknown_characters(rows):
+    with pytest.raises(ValueError, match="bad board character"):
+        setup_position({"size": 5, "board": rows}, GoBoard)
+
+
+@pytest.mark.parametrize("rows", ["...../.....", "...../...../...../...../...."])
+def test_board_field_rejects_wrong_shape(rows):
+    with pytest.raises(ValueError):
+        setup_position({"size": 5, "board": rows}, GoBoard)
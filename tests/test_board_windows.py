@@ -0,0 +1,95 @@
+import random
+
+import pytest
+
+from board import GoBoard
+from board_util import BLACK, WHITE, GoBoardUtil, WIN_CONDITION
+from compact_board import CompactGoBoard
+
+
+def recount(board):
+    """ window_stones and open_windows computed from the stones on board """
+    stones = [None, [], []]
+    open_windows = [0, 0, 0]
+    for window in board.windows:
+        counts = {BLACK: 0, WHITE: 0}
+        for point in window:
+            if board.board[point] in counts:
+                counts[board.board[point]] += 1
+        for color in (BLACK, WHITE):
+            stones[color].append(counts[color])
+            if counts[GoBoardUtil.opponent(color)] == 0:
+                open_windows[color] += 1
+    return stones, open_windows
+
+
+def assert_counts(board):
+    stones, open_windows = recount(board)
+    assert board.window_stones[BLACK] == stones[BLACK]
+    assert board.window_stones[WHITE] == stones[WHITE]
+    assert board.open_windows == open_windows
+
+
+@pytest.mark.parametrize("board_class", [GoBoard, CompactGoBoard])
+@pytest.mark.parametrize("size", [5, 7, 9])
+def test_windows_are_all_lines(board_class, size):
+    board = board_class(size)
+    # rows, columns and both diagonals
+    lines = 2 * size * (size - WIN_CONDITION + 1) + 2 * (size - WIN_CONDITION + 1) ** 2
+    assert len(board.windows) == lines
+    for w, window in enumerate(board.windows):
+        for point in window:
+            assert w in board.point_windows[point]
+
+
+@pytest.mark.parametrize("board_class", [GoBoard, CompactGoBoard])
+def test_counts_follow_play_and_undo(board_class):
+    rng = random.Random(3)
+    board = board_class(7)
+    for game in range(5):
+        played = []
+        color = BLACK
+        for move in rng.sample(board.get_empty_points().tolist(), 30):
+            board.play_move(move, color)
+            played.append(move)
+            assert_counts(board)
+            color = GoBoardUtil.opponent(color)
+        while played:
+            board.undo_move(played.pop())
+            assert_counts(board)
+    assert board.open_windows[BLACK] == board.open_windows[WHITE] == len(board.windows)
+
+
+@pytest.mark.parametrize("board_class", [GoBoard, CompactGoBoard])
+def test_copy_keeps_counts(board_class):
+    board = board_class(7)
+    board.play_move(board.pt(4, 4), BLACK)
+    board.play_move(board.pt(4, 5), WHITE)
+    copy = board.copy()
+    assert_counts(copy)
+    copy.play_move(copy.pt(1, 1), BLACK)
+    assert_counts(board)
+    assert_counts(copy)
+
+
+@pytest.mark.parametrize("board_class", [GoBoard, CompactGoBoard])
+def test_dead_draw_matches_recount(board_class):
+    rng = random.Random(5)
+    board = board_class(5)
+    for game in range(20):
+        played = []
+        color = BLACK
+        result = "unknown"
+        while result == "unknown":
+            move = GoBoardUtil.generate_random_move(board, color, rng)
+            board.play_move(move, color)
+            played.append(move)
+            open_windows = recount(board)[1]
+            dead = open_windows[BLACK] == 0 and open_windows[WHITE] == 0
+            assert board.is_dead_draw() == dead
+            result = board.get_result(color, move, WIN_CONDITION)
+            if dead and result not in ("black", "white"):
+                assert result == "draw"
+            color = GoBoardUtil.opponent(color)
+        for move in played:
+            board.undo_move(move)
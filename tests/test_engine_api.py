@@ -0,0 +1,56 @@
+import pytest
+
+from board_util import BLACK, WHITE, PASS, coord_to_point
+from engine_api import Engine
+
+
+def test_genmove_returns_python_int():
+    engine = Engine(7, {"numSimulations": 2}, seed=1)
+    move = engine.genmove()
+    assert type(move) is int
+    assert engine.moves == [(move, BLACK)]
+    assert engine.to_play == WHITE
+
+
+def test_forced_genmove_returns_python_int():
+    engine = Engine(7, {"numSimulations": 2}, seed=1)
+    for col in range(1, 5):
+        engine.play(coord_to_point(2, col, 7), BLACK)
+        engine.play(coord_to_point(6, col + 1, 7), WHITE)
+    move = engine.genmove(play=False)
+    assert type(move) is int
+    assert move == coord_to_point(2, 5, 7)
+
+
+def test_genmove_after_game_end_passes():
+    engine = Engine(7, {"numSimulations": 2}, seed=1)
+    for col in range(1, 6):
+        engine.play(coord_to_point(1, col, 7), BLACK)
+        if col < 5:
+            engine.play(coord_to_point(7, col, 7), WHITE)
+    assert engine.result == "black"
+    assert engine.genmove() == PASS
+
+
+@pytest.mark.parametrize("simulations", [0, -1])
+def test_bad_simulation_counts_are_rejected(simulations):
+    engine = Engine(7, {"numSimulations": 2}, seed=1)
+    with pytest.raises(ValueError):
+        engine.evaluate(simulations=simulations)
+    with pytest.raises(ValueError):
+        engine.genmove(simulations=simulations)
+    assert engine.moves == []
+
+
+@pytest.mark.parametrize("config", [{"numSimulations": 0}, {"numSimulations": -3},
+                                    {"roundSize": 0}])
+def test_bad_configs_are_rejected(config):
+    with pytest.raises(ValueError):
+        Engine(7, config, seed=1)
+
+
+def test_evaluate_scores_every_legal_move():
+    engine = Engine(5, {"numSimulations": 2}, seed=1)
+    scores = engine.evaluate(simulations=1)
+    assert sorted(scores) == engine.legal_moves()
+    assert all(0.0 <= score <= 1.0 for score in scores.values())
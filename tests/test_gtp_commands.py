@@ -0,0 +1,88 @@
+import io
+import queue
+import re
+import threading
+import time
+
+from board import GoBoard
+from board_util import BLACK
+from gtp_connection import GtpConnection, point_tables
+from Gomoku3 import FlatMCSimPlayer
+
+
+def connection(size=7, simulations=3):
+    board = GoBoard(size)
+    con = GtpConnection(FlatMCSimPlayer(simulations, board), board, out=io.StringIO())
+    con.player.seed(1)
+    return con
+
+
+def test_profile_genmove_writes_stats_to_file(tmp_path):
+    con = connection()
+    con.search = True
+    output = tmp_path / "genmove.prof.txt"
+    con.get_cmd("profile -o {} genmove b".format(output))
+    response = con.out.getvalue()
+    assert response.startswith("= ") and response.endswith("\n\n")
+    move = response[2:].strip()
+    point = point_tables(con.board.size)[1][move]
+    assert con.board.get_color(point) == BLACK
+    assert con.last_search["move"] == move
+    assert con.last_search["playouts"] == con.player.playouts > 0
+    report = output.read_text()
+    assert report.startswith("Profile: genmove b\n")
+    assert "function calls" in report
+    assert "Ordered by: cumulative time" in report
+    assert "Ordered by: internal time" in report
+    assert "startSimulation" in report
+
+
+def test_profile_usage_errors(tmp_path):
+    con = connection()
+    output = tmp_path / "unused.txt"
+    for command in ("profile", "profile -o {}".format(output), "profile profile genmove b",
+                    "profile nosuchcommand", "profile genmove"):
+        con.out.seek(0)
+        con.out.truncate()
+        con.get_cmd(command)
+        assert con.out.getvalue().startswith("? ")
+    assert not output.exists()
+    assert len(con.board.get_empty_points()) == 49
+
+
+INFO = re.compile(r"info move ([a-z]\d+) visits (\d+) winrate (\d\.\d{4}) rule (\w+)")
+
+
+def test_analyze_stops_when_input_arrives():
+    con = connection(simulations=1)
+    con.get_cmd("play b d4")
+    con.out.seek(0)
+    con.out.truncate()
+    con.input = queue.Queue()
+    timer = threading.Timer(0.5, con.input.put, ["genmove w\n"])
+    start = time.perf_counter()
+    timer.start()
+    con.get_cmd("analyze w 5")
+    elapsed = time.perf_counter() - start
+    timer.join()
+    # the next command is left for the input loop
+    assert con.input.get_nowait() == "genmove w\n"
+    assert 0.5 <= elapsed < 5
+    lines = con.out.getvalue().split("\n")
+    assert lines[0] == "= "
+    assert lines[-2:] == ["", ""]
+    info = lines[1:-2]
+    assert info
+    legal = set(con.legal_moves("w").lower().split())
+    for line in info:
+        entries = INFO.findall(line)
+        assert 1 <= len(entries) <= 5
+        assert " ".join("info move {} visits {} winrate {} rule {}".format(*entry)
+                        for entry in entries) == line
+        for move, visits, winrate, rule in entries:
+            assert move in legal
+            assert 0.0 <= float(winrate) <= 1.0
+            assert rule in ("Win", "BlockWin", "OpenFour", "BlockOpenFour", "Random")
+        winrates = [float(entry[2]) for entry in entries]
+        assert winrates == sorted(winrates, reverse=True)
+    assert con.last_search["seed"] is not None
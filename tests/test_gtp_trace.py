@@ -0,0 +1,96 @@
+import io
+import json
+
+from board import GoBoard
+from gtp_connection import GtpConnection
+from gtp_trace import CommandTracer, Histogram
+from Gomoku3 import FlatMCSimPlayer
+
+
+def test_histogram_buckets():
+    histogram = Histogram()
+    # exact below 2^7, then buckets of width 2, 4, ... per power of two
+    assert [histogram.bucket_index(v) for v in (0, 127, 128, 129, 130)] == \
+        [0, 127, 128, 128, 129]
+    assert histogram.bucket_value(128) == 128
+    assert histogram.bucket_value(129) == 130
+    assert histogram.bucket_value(histogram.bucket_index(255)) == 254
+    assert histogram.bucket_value(histogram.bucket_index(256)) == 256
+    assert histogram.bucket_value(histogram.bucket_index(259)) == 256
+    for value in range(5000):
+        index = histogram.bucket_index(value)
+        low = histogram.bucket_value(index)
+        assert low <= value < histogram.bucket_value(index + 1)
+        assert value - low < max(1, 2 * value / 128)
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0
+    for value in range(1, 101):
+        histogram.record(value)
+    assert [histogram.percentile(p) for p in (1, 50, 90, 99, 100)] == [1, 50, 90, 99, 100]
+    assert histogram.mean() == 50.5
+    histogram.record(1003)
+    assert (histogram.min, histogram.max, histogram.total) == (1, 1003, 101)
+    # the lowest value of the bucket of 1003
+    assert histogram.percentile(100) == 1000
+    histogram.reset()
+    assert histogram.total == 0 and histogram.max is None
+
+
+def traced_connection(log_file=None):
+    board = GoBoard(7)
+    tracer = CommandTracer(log_file)
+    con = GtpConnection(FlatMCSimPlayer(2, board), board, tracer=tracer,
+                        out=io.StringIO())
+    return con, tracer
+
+
+def test_trace_records():
+    log = io.StringIO()
+    con, tracer = traced_connection(log)
+    con.search = True
+    con.get_cmd("play b d4")
+    con.get_cmd("genmove w")
+    entries = [json.loads(line) for line in log.getvalue().splitlines()]
+    assert [entry["command"] for entry in entries] == ["play", "genmove"]
+    assert entries[0]["args"] == ["b", "d4"]
+    assert entries[1]["args"] == ["w"]
+    for entry in entries:
+        assert set(entry) == {"time", "command", "args", "size", "stones",
+                              "playouts", "wall_ms", "cpu_ms"}
+        assert entry["size"] == 7
+        assert entry["wall_ms"] >= 0 and entry["cpu_ms"] >= 0
+    # stones and playouts are read after the command
+    assert (entries[0]["stones"], entries[0]["playouts"]) == (1, 0)
+    assert entries[1]["stones"] == 2
+    assert entries[1]["playouts"] == con.player.playouts > 0
+    assert tracer.wall["genmove"].total == tracer.cpu["genmove"].total == 1
+
+
+def test_trace_stats_prints_then_resets():
+    con, tracer = traced_connection()
+    con.get_cmd("play b d4")
+    con.get_cmd("play w d5")
+    con.out.truncate(0)
+    con.out.seek(0)
+    con.get_cmd("trace_stats")
+    lines = con.out.getvalue().splitlines()
+    assert lines[0] == "= "
+    assert lines[1].startswith("command count")
+    play = [line.split() for line in lines if line.startswith("play ")]
+    assert len(play) == 1 and play[0][1] == "2"
+    assert len(play[0][2].split("/")) == len(play[0][3].split("/")) == 5
+    con.get_cmd("trace_stats reset")
+    # only the reset command itself has been timed since
+    assert sorted(tracer.wall) == ["trace_stats"]
+    assert tracer.wall["trace_stats"].total == 1
+    assert "play" not in tracer.summary()
+
+
+def test_trace_stats_without_tracer():
+    board = GoBoard(7)
+    con = GtpConnection(FlatMCSimPlayer(2, board), board, out=io.StringIO())
+    con.get_cmd("trace_stats")
+    assert con.out.getvalue().startswith("? tracing is off")
@@ -0,0 +1,160 @@
+import pytest
+
+from board_util import BLACK, WHITE, GoBoardUtil
+from Gomoku3 import FlatMCSimPlayer
+from node_store import NULL, NodeStore
+from selfplay import apply_config, player_config
+from test_search import position
+
+
+def test_capacity_is_a_hard_cap():
+    store = NodeStore(4)
+    root = store.new_node(0)
+    assert store.expand(root, [10, 11, 12])
+    assert store.available == 0
+    assert store.new_node(13) == NULL
+    assert store.add_child(root, 13) == NULL
+    assert not store.expand(root, [14])
+    assert store.num_used == 4
+    assert store.nbytes == 4 * 20
+
+
+def test_children_iteration():
+    store = NodeStore(16)
+    root = store.new_node(0)
+    store.expand(root, [10, 11, 12])
+    # children are added in front
+    moves = [int(store.move[child]) for child in store.children(root)]
+    assert moves == [12, 11, 10]
+    assert list(store.child_array(root)) == list(store.children(root))
+    assert store.move[store.find_child(root, 11)] == 11
+    assert store.find_child(root, 99) == NULL
+    leaf = store.find_child(root, 10)
+    assert list(store.children(leaf)) == []
+    assert store.child_array(leaf).size == 0
+    assert store.uct_child(leaf, 1.4) == NULL
+    assert store.most_visited_child(leaf) == NULL
+
+
+def test_update_alternates_players():
+    store = NodeStore(8)
+    root = store.new_node(0)
+    child = store.add_child(root, 10)
+    grandchild = store.add_child(child, 11)
+    store.update([child, grandchild], 1.0)
+    store.update([child, grandchild], 0.5)
+    assert list(store.visits[[child, grandchild]]) == [2, 2]
+    assert list(store.wins[[child, grandchild]]) == [1.5, 0.5]
+
+
+def test_uct_child_visits_every_child_first():
+    store = NodeStore(8)
+    root = store.new_node(0)
+    store.expand(root, [10, 11, 12])
+    seen = []
+    for i in range(3):
+        child = store.uct_child(root, 1.4)
+        seen.append(int(store.move[child]))
+        store.visits[root] += 1
+        store.update([child], 0.0)
+    assert sorted(seen) == [10, 11, 12]
+    store.visits[root] += 1
+    store.update([store.find_child(root, 11)], 1.0)
+    assert store.move[store.uct_child(root, 1.4)] == 11
+    assert store.move[store.most_visited_child(root)] == 11
+
+
+def test_promote_recycles_the_rest_of_the_tree():
+    store = NodeStore(16)
+    root = store.new_node(0)
+    store.expand(root, [10, 11, 12])
+    kept = store.find_child(root, 11)
+    store.expand(kept, [20, 21])
+    store.expand(store.find_child(root, 12), [30, 31, 32])
+    assert store.num_used == 1 + 3 + 2 + 3
+    new_root = store.promote(root, kept)
+    assert new_root == kept
+    assert store.num_used == 3
+    assert [int(store.move[c]) for c in store.children(kept)] == [21, 20]
+    # the freed nodes are handed out again before the unused ones
+    top = store.top
+    for move in range(40, 46):
+        assert store.add_child(kept, move) != NULL
+    assert store.top == top
+    assert store.num_used == 9
+    store.clear()
+    assert store.num_used == 0 and store.available == 16
+
+
+def tree_player(board, nodes=100000, simulations=5):
+    player = FlatMCSimPlayer(10, board)
+    apply_config(player, {"numSimulations": simulations, "treeNodes": nodes})
+    player.seed(2)
+    return player
+
+
+def test_tree_search_config():
+    board = position([(4, 4)], [(4, 5)])
+    player = tree_player(board, nodes=5000)
+    assert player_config(player)["treeNodes"] == 5000
+    store = player.tree
+    apply_config(player, player_config(player))
+    assert player.tree is store
+    apply_config(player, {})
+    assert player.tree is None
+
+
+def test_tree_search_plays_open_four():
+    board = position([(4, 3), (4, 4), (4, 5)], [(1, 1), (7, 7), (1, 7)])
+    player = tree_player(board, simulations=20)
+    move = player.startSimulation(board, "b")
+    assert move in (board.pt(4, 2), board.pt(4, 6))
+    legal = GoBoardUtil.generate_legal_moves(board, BLACK)
+    assert player.playouts == 20 * len(legal)
+    assert sorted(player.scores) == sorted(legal)
+    root = player.treeRoot
+    assert player.tree.visits[root] == player.playouts
+    # the tree grew below the root moves
+    assert player.tree.num_used > 1 + len(legal)
+
+
+def test_tree_search_respects_node_cap():
+    board = position([(4, 4)], [(4, 5)])
+    legal = GoBoardUtil.generate_legal_moves(board, BLACK)
+    player = tree_player(board, nodes=len(legal) + 60)
+    move = player.startSimulation(board, "b")
+    assert move in legal
+    assert player.tree.num_used <= player.tree.capacity
+    assert player.playouts == 5 * len(legal)
+    with pytest.raises(ValueError):
+        tree_player(board, nodes=len(legal)).startSimulation(board, "b")
+
+
+def test_tree_is_reused_after_move_and_reply():
+    board = position([(4, 4)], [(4, 5)])
+    player = tree_player(board)
+    move = player.startSimulation(board, "b")
+    store = player.tree
+    root = player.treeRoot
+    child = store.find_child(root, move)
+    reply = store.most_visited_child(child)
+    reply_move = int(store.move[reply])
+    visits = int(store.visits[reply])
+    assert visits > 0
+    subtree = count_nodes(store, reply)
+    board.play_move(move, BLACK)
+    board.play_move(reply_move, WHITE)
+    player.tree_root(BLACK)
+    assert player.treeRoot == reply
+    assert store.visits[reply] == visits
+    # everything outside the kept subtree went back to the free list
+    assert store.num_used == subtree
+    # the same position again keeps the root, another one clears the tree
+    assert player.tree_root(BLACK) == reply
+    board.undo_move(reply_move)
+    player.tree_root(WHITE)
+    assert store.num_used == 1
+
+
+def count_nodes(store, node):
+    return 1 + sum(count_nodes(store, child) for child in store.children(node))
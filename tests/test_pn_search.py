@@ -0,0 +1,64 @@
+import pytest
+
+from board import GoBoard
+from board_util import BLACK, WHITE, PASS, WIN_CONDITION
+from compact_board import CompactGoBoard
+from pn_search import ProofNumberSearch, solve
+
+
+def position(black, white, board_class=GoBoard, size=7):
+    board = board_class(size)
+    for row, col in black:
+        board.play_move(board.pt(row, col), BLACK)
+    for row, col in white:
+        board.play_move(board.pt(row, col), WHITE)
+    return board
+
+
+@pytest.mark.parametrize("board_class", [GoBoard, CompactGoBoard])
+def test_immediate_win(board_class):
+    board = position([(2, 2), (2, 3), (2, 4), (2, 5)], [(2, 1), (5, 5), (6, 6)], board_class)
+    before = list(board.board)
+    assert solve(board, BLACK, 100) == ("win", board.pt(2, 6))
+    assert list(board.board) == before
+
+
+def test_open_three_is_a_proven_win():
+    board = position([(4, 3), (4, 4), (4, 5)], [(1, 1), (1, 7)])
+    result, move = solve(board, BLACK, 5000)
+    assert result == "win"
+    board.play_move(move, BLACK)
+    if board.get_result(BLACK, move, WIN_CONDITION) != "black":
+        assert solve(board, WHITE, 5000)[0] == "loss"
+
+
+def test_open_four_against_is_a_proven_loss():
+    board = position([(4, 2), (4, 3), (4, 4), (4, 5)], [(1, 1), (1, 7), (7, 7)])
+    assert solve(board, WHITE, 5000) == ("loss", PASS)
+
+
+def test_broken_line_is_not_a_win():
+    # line_rule reads d1 as a win for black through the white stone on e1
+    board = position([(1, 1), (1, 2), (1, 3), (1, 6)], [(1, 5)])
+    search = ProofNumberSearch(board)
+    search.attacker = BLACK
+    assert search.generate_moves(BLACK)[1] is None
+    # nor does white have to block d1: the defender keeps every move
+    assert sorted(search.generate_moves(WHITE)[0]) == board.get_empty_points().tolist()
+    result, move = solve(board, BLACK, 1000)
+    assert move != board.pt(1, 4)
+    if result == "win":
+        board.play_move(move, BLACK)
+        assert solve(board, WHITE, 1000)[0] == "loss"
+
+
+def test_real_four_forces_the_block():
+    board = position([(2, 2), (2, 3), (2, 4), (2, 5)], [(2, 1), (6, 6)])
+    search = ProofNumberSearch(board)
+    search.attacker = BLACK
+    assert search.generate_moves(WHITE) == ([board.pt(2, 6)], None)
+    assert search.generate_moves(BLACK) == ([], "win")
+
+
+def test_budget_exhausted_is_unknown():
+    assert solve(GoBoard(7), BLACK, 50) == ("unknown", PASS)
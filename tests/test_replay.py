@@ -0,0 +1,88 @@
+import io
+
+from board import GoBoard
+from gtp_connection import GtpConnection
+from Gomoku3 import FlatMCSimPlayer
+from replay import Recorder, read_record, replay
+from selfplay import apply_config, player_config
+
+COMMANDS = ["boardsize 7", "genmove b", "play w d4", "genmove b",
+            "policy rulebased", "genmove w", "legal_moves b", "quit"]
+
+
+def record_session(tmp_path, config, search=True, commands=COMMANDS):
+    """ Run commands with a recorder attached and return the record path """
+    board = GoBoard(7)
+    player = FlatMCSimPlayer(10, board)
+    apply_config(player, config)
+    con = GtpConnection(player, board, out=io.StringIO())
+    con.search = search
+    path = tmp_path / "session.jsonl"
+    with open(str(path), "w") as f:
+        con.recorder = Recorder(f, {"board": "numpy", "size": 7,
+                                    "config": player_config(player),
+                                    "policy": con.policy, "search": search,
+                                    "tuned": None, "tablebase": None})
+        for command in commands:
+            if command == "quit":
+                break
+            con.get_cmd(command)
+    return str(path)
+
+
+def test_record_format(tmp_path):
+    path = record_session(tmp_path, {"numSimulations": 1})
+    settings, entries = read_record(path)
+    assert settings["config"]["numSimulations"] == 1
+    assert [entry["command"] for entry in entries] == COMMANDS[:-1]
+    searches = [entry for entry in entries if "seed" in entry]
+    assert len(searches) == 3
+    for entry in searches:
+        assert set(entry) == {"command", "wall_ms", "seed", "move", "playouts"}
+        assert entry["playouts"] > 0
+
+
+def test_replay_reproduces_searches(tmp_path):
+    path = record_session(tmp_path, {"numSimulations": 1})
+    lines = []
+    assert replay(*read_record(path), log=lines.append) == 0
+    assert len(lines) == 4
+    assert not any("MISMATCH" in line for line in lines)
+
+
+def test_replay_reproduces_threaded_searches(tmp_path):
+    path = record_session(tmp_path, {"numSimulations": 2, "threads": 2, "amaf": "rave"})
+    assert replay(*read_record(path), log=lambda line: None) == 0
+
+
+def test_replay_reproduces_rule_policy_moves(tmp_path):
+    path = record_session(tmp_path, {}, search=False)
+    settings, entries = read_record(path)
+    assert all(entry["playouts"] == 0 for entry in entries if "seed" in entry)
+    assert replay(settings, entries, log=lambda line: None) == 0
+
+
+def test_replay_reports_mismatches(tmp_path):
+    path = record_session(tmp_path, {"numSimulations": 1})
+    settings, entries = read_record(path)
+    search = [entry for entry in entries if "seed" in entry][1]
+    search["playouts"] += 1
+    lines = []
+    assert replay(settings, entries, log=lines.append) == 1
+    assert sum("MISMATCH" in line for line in lines) == 1
+
+
+def test_replay_profiles_one_search(tmp_path):
+    path = record_session(tmp_path, {"numSimulations": 1})
+    profile = tmp_path / "profile.txt"
+    assert replay(*read_record(path), profile=2, profile_out=str(profile),
+                  log=lambda line: None) == 0
+    assert profile.read_text().startswith("Profile: genmove b")
+
+
+def test_seed_search_takes_replay_seeds_first():
+    board = GoBoard(7)
+    con = GtpConnection(FlatMCSimPlayer(2, board), board, out=io.StringIO())
+    con.replay_seeds.extend([11, 12])
+    assert [con.seed_search() for i in range(3)][:2] == [11, 12]
+    assert not con.replay_seeds
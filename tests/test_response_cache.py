@@ -0,0 +1,96 @@
+import io
+
+from board import GoBoard
+from board_util import BLACK, WHITE
+from gtp_connection import GtpConnection
+from Gomoku3 import FlatMCSimPlayer
+
+
+def make_connection(size=7):
+    board = GoBoard(size)
+    return GtpConnection(FlatMCSimPlayer(5, board), board, out=io.StringIO())
+
+
+def response(con, command):
+    con.out.seek(0)
+    con.out.truncate()
+    con.get_cmd(command)
+    return con.out.getvalue()
+
+
+def legal_moves(con):
+    return response(con, "gogui-rules_legal_moves").lower().split()[1:]
+
+
+def count_builds(con, name):
+    """ Wrap the builder method name of con and count its calls """
+    calls = []
+    build = getattr(con, name)
+
+    def counted(*args):
+        calls.append(args)
+        return build(*args)
+    setattr(con, name, counted)
+    return calls
+
+
+def test_repeated_query_is_served_from_cache():
+    con = make_connection()
+    calls = count_builds(con, "legal_moves")
+    first = response(con, "legal_moves b")
+    assert response(con, "legal_moves b") == first
+    assert len(calls) == 1
+    # other arguments are a different entry
+    response(con, "legal_moves w")
+    assert len(calls) == 2
+
+
+def test_moves_invalidate():
+    con = make_connection()
+    assert "d4" in legal_moves(con)
+    response(con, "play b d4")
+    assert "d4" not in legal_moves(con)
+    response(con, "play_sequence w a1 b b1")
+    assert "a1" not in legal_moves(con)
+    response(con, "setup c3")
+    moves = legal_moves(con)
+    assert "c3" not in moves and "a1" in moves and "d4" in moves
+
+
+def test_board_reset_invalidates():
+    con = make_connection()
+    response(con, "play b d4")
+    board = response(con, "gogui-rules_board")
+    response(con, "clear_board")
+    assert response(con, "gogui-rules_board") != board
+    empty = response(con, "showboard")
+    response(con, "boardsize 5")
+    assert response(con, "showboard") != empty
+    assert len(legal_moves(con)) == 25
+
+
+def test_side_to_move_invalidates():
+    con = make_connection()
+    response(con, "play b b2")
+    response(con, "play b c2")
+    response(con, "play b d2")
+    response(con, "play b e2")
+    calls = count_builds(con, "policy_moves")
+    # black to play would win, white has to block
+    con.board.current_player = WHITE
+    white = response(con, "policy_moves")
+    assert white.startswith("= BlockWin")
+    con.board.current_player = BLACK
+    black = response(con, "policy_moves")
+    assert black.startswith("= Win")
+    assert len(calls) == 2
+
+
+def test_game_result_invalidates():
+    con = make_connection()
+    for col in "abcd":
+        response(con, "play b {}1".format(col))
+    assert response(con, "gogui-rules_legal_moves") != "= \n\n"
+    response(con, "play b e1")
+    assert con.result == "black"
+    assert response(con, "gogui-rules_legal_moves") == "= \n\n"
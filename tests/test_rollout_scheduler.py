@@ -0,0 +1,54 @@
+import threading
+import types
+
+import pytest
+
+from board import GoBoard
+from board_util import BLACK
+from rollout_scheduler import RolloutScheduler
+
+
+def test_rollouts_fill_stats():
+    scheduler = RolloutScheduler(batch_size=64, seed=1)
+    try:
+        stats = scheduler.rollout(GoBoard(7), BLACK, 100)
+    finally:
+        scheduler.stop()
+    assert sum(stats.values()) == 100
+
+
+def test_failing_request_raises_in_caller():
+    scheduler = RolloutScheduler(batch_size=64, seed=1)
+    # a position without points makes the batch fail in play_rollouts
+    broken = types.SimpleNamespace(board=[], size=7)
+    result = {}
+
+    def submit():
+        try:
+            scheduler.rollout(broken, BLACK, 10)
+        except ValueError as e:
+            result["error"] = e
+
+    try:
+        thread = threading.Thread(target=submit)
+        thread.start()
+        thread.join(10)
+        assert not thread.is_alive(), "caller still blocked"
+        assert isinstance(result.get("error"), ValueError)
+        assert not scheduler.pending
+        # the scheduler thread survives and serves the next request
+        stats = scheduler.rollout(GoBoard(7), BLACK, 20)
+        assert sum(stats.values()) == 20
+    finally:
+        scheduler.stop()
+
+
+def test_failing_request_spanning_batches():
+    scheduler = RolloutScheduler(batch_size=8, seed=1)
+    broken = types.SimpleNamespace(board=[], size=7)
+    try:
+        with pytest.raises(ValueError):
+            scheduler.rollout(broken, BLACK, 50)
+        assert not scheduler.pending
+    finally:
+        scheduler.stop()
@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+
+from board import GoBoard
+from board_util import BLACK, WHITE, GoBoardUtil
+from compact_board import CompactGoBoard
+from Gomoku3 import FlatMCSimPlayer
+from rule_policy import RANDOM, RULE_NAMES, batched_rule_moves, get_rays, rule_codes
+
+
+def random_positions(board_class, size, count, seed):
+    """ Boards after random games of random length, stopped at the first five """
+    rng = random.Random(seed)
+    boards = []
+    for i in range(count):
+        board = board_class(size)
+        color = BLACK
+        for k in range(rng.randrange(size * size)):
+            move = GoBoardUtil.generate_random_move(board, color, rng)
+            board.play_move(move, color)
+            if board.get_result(color, move, 5) != "unknown":
+                break
+            color = GoBoardUtil.opponent(color)
+        boards.append(board)
+    return boards
+
+
+def bucket_codes(board, color):
+    """ Rule code of every empty point by FlatMCSimPlayer.rule_buckets """
+    codes = {}
+    buckets = FlatMCSimPlayer(1, board).rule_buckets(color)
+    for code, (rule, moves) in enumerate(buckets, 1):
+        assert rule == RULE_NAMES[code]
+        for move in moves:
+            codes[int(move)] = code
+    return codes
+
+
+@pytest.mark.parametrize("board_class", [GoBoard, CompactGoBoard])
+@pytest.mark.parametrize("color", [BLACK, WHITE])
+@pytest.mark.parametrize("size", [7, 9])
+def test_rule_codes_match_rule_buckets(board_class, color, size):
+    boards = random_positions(board_class, size, 40, seed=size * 10 + color)
+    arrays = np.array([list(board.board) for board in boards])
+    codes = rule_codes(arrays, [color] * len(boards), size)
+    found = set()
+    for board, board_codes in zip(boards, codes):
+        expected = bucket_codes(board, color)
+        empty = sorted(int(point) for point in board.get_empty_points())
+        assert sorted(expected) == empty
+        assert {point: int(board_codes[point]) for point in empty} == expected
+        # every other point is marked as not playable
+        assert (np.delete(board_codes, empty) == RANDOM + 1).all()
+        found.update(expected.values())
+    # the positions exercise more than the Random bucket
+    assert len(found) >= 3
+
+
+def test_batched_moves_follow_rules():
+    size = 7
+    boards = random_positions(GoBoard, size, 30, seed=5)
+    full = GoBoard(size)
+    on_board = get_rays(size)[0]
+    full.board[on_board] = np.where(np.arange(on_board.size) % 2, BLACK, WHITE)
+    boards.append(full)
+    colors = [BLACK if i % 2 else WHITE for i in range(len(boards))]
+    arrays = np.array([board.board for board in boards])
+    moves, rules = batched_rule_moves(arrays, np.array(colors), size,
+                                      np.random.default_rng(3))
+    for board, color, move, rule in zip(boards[:-1], colors, moves, rules):
+        bucket = FlatMCSimPlayer(1, board).rules(color)
+        name, bucket_moves = next(iter(bucket.items()))
+        assert RULE_NAMES[int(rule)] == name
+        assert int(move) in [int(m) for m in bucket_moves]
+    assert (moves[-1], rules[-1]) == (-1, RANDOM + 1)
@@ -0,0 +1,189 @@
+import io
+import random
+
+import pytest
+
+from board import GoBoard
+from board_util import BLACK, WHITE
+from gtp_connection import GtpConnection
+from Gomoku3 import FlatMCSimPlayer
+from selfplay import apply_config
+
+
+def position(black, white, size=7):
+    """ A board with stones on the (row, col) points black and white """
+    board = GoBoard(size)
+    for row, col in black:
+        board.play_move(board.pt(row, col), BLACK)
+    for row, col in white:
+        board.play_move(board.pt(row, col), WHITE)
+    return board
+
+
+def connection(board, player=None):
+    player = player or FlatMCSimPlayer(5, board)
+    return GtpConnection(player, board, out=io.StringIO())
+
+
+def response(con, command):
+    con.out.seek(0)
+    con.out.truncate()
+    con.get_cmd(command)
+    return con.out.getvalue()
+
+
+def test_forced_move_ignores_broken_line():
+    # line_rule counts past the white stone on e1 and reports d1 as a win
+    board = position([(1, 1), (1, 2), (1, 3), (1, 6)], [(1, 5)])
+    player = FlatMCSimPlayer(5, board)
+    assert player.rules(BLACK) == {"Win": [board.pt(1, 4)]}
+    assert player.forced_move(BLACK) is None
+
+
+def test_forced_move_wins_and_blocks():
+    board = position([(2, 2), (2, 3), (2, 4), (2, 5)], [(4, 4), (5, 5), (6, 6)])
+    player = FlatMCSimPlayer(5, board)
+    assert player.forced_move(BLACK) in (board.pt(2, 1), board.pt(2, 6))
+    board = position([(2, 2), (2, 3), (2, 4), (2, 5)], [(2, 1), (5, 5), (6, 6)])
+    player = FlatMCSimPlayer(5, board)
+    assert player.forced_move(WHITE) == board.pt(2, 6)
+    # two blocks needed: no forced move, the search has to run
+    board = position([(2, 2), (2, 3), (2, 4), (2, 5)], [(5, 5), (6, 6), (7, 7)])
+    player = FlatMCSimPlayer(5, board)
+    assert player.forced_move(WHITE) is None
+
+
+def test_search_returns_forced_move_without_playouts():
+    board = position([(2, 2), (2, 3), (2, 4), (2, 5)], [(2, 1), (5, 5), (6, 6)])
+    player = FlatMCSimPlayer(50, board)
+    assert player.startSimulation(board, "w") == board.pt(2, 6)
+    assert player.playouts == 0
+
+
+def test_search_stays_within_playout_budget():
+    board = position([(4, 4)], [(4, 5)])
+    player = FlatMCSimPlayer(20, board)
+    player.seed(1)
+    move = player.startSimulation(board, "b")
+    legal = len(board.get_empty_points())
+    assert move in board.get_empty_points().tolist()
+    assert 0 < player.playouts <= 20 * legal
+
+
+def test_search_returns_single_legal_move():
+    # 4x4 has no five-point windows, so there is no forced move either
+    board = GoBoard(4)
+    stones = [board.pt(row, col) for row in range(1, 5) for col in range(1, 5)]
+    for k, point in enumerate(stones[:-1]):
+        board.play_move(point, BLACK if (k + k // 4) % 2 == 0 else WHITE)
+    player = FlatMCSimPlayer(20, board)
+    assert player.startSimulation(board, "b") == stones[-1]
+    assert player.playouts == 0
+
+
+def test_search_rejects_zero_simulations():
+    board = position([(4, 4)], [(4, 5)])
+    player = FlatMCSimPlayer(0, board)
+    with pytest.raises(ValueError):
+        player.startSimulation(board, "b")
+    with pytest.raises(ValueError):
+        apply_config(FlatMCSimPlayer(10, board), {"numSimulations": 0})
+    with pytest.raises(ValueError):
+        apply_config(FlatMCSimPlayer(10, board), {"roundSize": 0})
+
+
+class FixedRatePlayer(FlatMCSimPlayer):
+    """
+    Playouts won by color with a fixed rate per first move, drawn from a
+    random stream of that move, so every search sees the same results
+    for a move however many playouts the other moves get.
+    """
+    def __init__(self, numSimulations, board, rates):
+        FlatMCSimPlayer.__init__(self, numSimulations, board)
+        self.rates = rates
+        self.streams = {move: random.Random(move) for move in rates}
+
+    def playout(self, move, color, policy="random", movesMade=None):
+        won = self.streams[move].random() < self.rates[move]
+        return "black" if won == (color == BLACK) else "white"
+
+
+def test_confidence_stopping_picks_exhaustive_move():
+    board = position([(4, 4)], [(4, 5)])
+    legal = board.get_empty_points().tolist()
+    rates = {move: 0.3 + 0.4 * (k % 5) / 4 for k, move in enumerate(legal)}
+    rates[legal[7]] = 0.9
+
+    exhaustive = FixedRatePlayer(200, board, rates)
+    exhaustive.roundSize = 200
+    best = exhaustive.startSimulation(board, "b")
+    assert exhaustive.playouts == 200 * len(legal)
+
+    early = FixedRatePlayer(200, board, rates)
+    early.roundSize = 10
+    early.confidence = 0.01
+    assert early.startSimulation(board, "b") == best == legal[7]
+    assert early.playouts < exhaustive.playouts
+
+
+def test_genmove_plays_rule_policy_move_by_default():
+    board = position([(2, 2), (2, 3), (2, 4)], [(5, 5), (6, 6)])
+    con = connection(board)
+    assert con.player.rules(BLACK) == {"OpenFour": [board.pt(2, 5)]}
+    assert response(con, "genmove b") == "= e2\n\n"
+    assert con.player.playouts == 0
+
+
+def test_genmove_searches_when_enabled():
+    board = position([(4, 4)], [(4, 5)])
+    con = connection(board)
+    con.search = True
+    assert response(con, "genmove b").startswith("= ")
+    assert con.player.playouts > 0
+    assert con.last_search["playouts"] == con.player.playouts
+
+
+def test_threads_return_forced_move_without_playouts():
+    board = position([(2, 2), (2, 3), (2, 4), (2, 5)], [(2, 1), (5, 5), (6, 6)])
+    player = FlatMCSimPlayer(50, board)
+    player.threads = 3
+    assert player.startSimulation(board, "w") == board.pt(2, 6)
+    assert player.playouts == 0
+
+
+def test_threads_are_repeatable_from_a_seed():
+    board = position([(4, 4)], [(4, 5)])
+    results = []
+    for attempt in range(2):
+        player = FlatMCSimPlayer(6, board)
+        player.threads = 3
+        player.seed(7)
+        move = player.startSimulation(board, "b")
+        results.append((move, player.scores, player.playouts))
+    assert results[0] == results[1]
+    assert results[0][2] > 0
+
+
+def test_threads_respect_time_limit():
+    import time
+    board = position([(4, 4)], [(4, 5)])
+    player = FlatMCSimPlayer(10 ** 6, board)
+    player.threads = 2
+    player.timeLimit = 0.2
+    start = time.perf_counter()
+    player.startSimulation(board, "b")
+    assert time.perf_counter() - start < 5
+    assert player.playouts < 10 ** 6
+
+
+def test_threads_keep_amaf_statistics():
+    board = position([(4, 4)], [(4, 5)])
+    player = FlatMCSimPlayer(4, board)
+    player.threads = 2
+    player.amaf = "rave"
+    player.seed(3)
+    move = player.startSimulation(board, "b")
+    legal = board.get_empty_points().tolist()
+    assert sorted(player.scores) == legal
+    assert player.playouts == 4 * len(legal)
+    assert move == max(legal, key=lambda m: player.scores[m])
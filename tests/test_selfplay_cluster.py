@@ -0,0 +1,79 @@
+import io
+import json
+import socket
+import threading
+
+from selfplay_cluster import Coordinator, make_jobs, run_coordinator, run_worker
+
+CONFIG = {"numSimulations": 1}
+
+
+def replaying_worker(port, log):
+    """
+    A worker that fakes the result of its first job, then answers its
+    second job with the result of job 0 again and disconnects.
+    """
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        rfile = sock.makefile("r")
+        wfile = sock.makefile("w")
+
+        def send(message):
+            wfile.write(json.dumps(message) + "\n")
+            wfile.flush()
+
+        send({"type": "hello", "worker": "replayer"})
+        for job_id in (None, 0):
+            job = json.loads(rfile.readline())["job"]
+            log.append(job["id"])
+            send({"type": "result", "id": job["id"] if job_id is None else job_id,
+                  "record": {"worker": "replayer", "result": "draw"}})
+
+
+def test_coordinator_reassigns_and_drops_duplicates():
+    jobs = make_jobs(4, 7, CONFIG, CONFIG, seed=11)
+    out = io.StringIO()
+    replayed = []
+
+    def on_listen(port):
+        # one at a time, so that every worker gets a known job
+        run_worker("127.0.0.1", port, name="quitter", max_games=1)
+        worker = threading.Thread(target=replaying_worker, args=(port, replayed))
+        worker.start()
+        worker.join()
+
+    written = run_coordinator(jobs, out, host="127.0.0.1", port=0,
+                              local_workers=1, on_listen=on_listen)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert written == len(records) == 4
+    assert sorted(record["id"] for record in records) == [0, 1, 2, 3]
+    by_id = {record["id"]: record for record in records}
+    # the quitter played job 0 and left with job 1, which went to the
+    # replayer; its second job 2 went to the local worker process
+    assert replayed == [1, 2]
+    assert by_id[0]["worker"] == "quitter"
+    assert by_id[0]["seed"] == 11 and by_id[0]["black"] == CONFIG
+    assert by_id[1]["worker"] == "replayer"
+    for job_id in (2, 3):
+        assert by_id[job_id]["worker"] not in ("quitter", "replayer")
+        assert by_id[job_id]["seed"] == 11 + job_id
+    assert by_id[3]["white"] == CONFIG
+
+
+def test_coordinator_release_and_complete():
+    jobs = make_jobs(2, 7, {}, {"numSimulations": 2})
+    assert jobs[1]["black"] == {"numSimulations": 2}
+    out = io.StringIO()
+    coordinator = Coordinator(jobs, out)
+    first = coordinator.next_job()
+    coordinator.release(first)
+    assert coordinator.next_job() is first
+    coordinator.complete(0, {"result": "black"})
+    coordinator.complete(0, {"result": "white"})
+    # a released job that was done in the meantime is not queued again
+    coordinator.release(first)
+    assert coordinator.next_job()["id"] == 1
+    coordinator.complete(1, {"result": "draw"})
+    assert coordinator.finished.is_set()
+    assert coordinator.next_job() is None
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == \
+        [{"result": "black", "id": 0}, {"result": "draw", "id": 1}]
@@ -0,0 +1,63 @@
+import numpy as np
+
+from board import GoBoard
+from board_util import GoBoardUtil, BLACK
+from Gomoku3 import FlatMCSimPlayer
+from shared_stats import SharedStats, StatsWriter
+
+
+def test_writer_flushes_in_batches_and_on_close():
+    stats = SharedStats(3, 2)
+    try:
+        writer = StatsWriter(stats, 1, flush_every=4)
+        for move_index, win in [(0, 1), (2, 0.5), (2, 0)]:
+            writer.record(move_index, win)
+        # below flush_every: nothing in shared memory yet
+        assert stats.totals()[0].sum() == 0
+        writer.record(1, 1)
+        visits, wins = stats.totals()
+        assert list(visits) == [1, 1, 2]
+        assert list(wins) == [1, 1, 0.5]
+        writer.record(0, 0)
+        writer.flush()
+        visits, wins = stats.totals()
+        assert list(visits) == [2, 1, 2]
+        assert list(stats.visits[0]) == [0, 0, 0]
+        assert writer.pending == 0
+        assert stats.best_move_index() == 1
+    finally:
+        stats.close()
+
+
+def test_reader_attaches_to_block():
+    stats = SharedStats(2, 1)
+    try:
+        reader = SharedStats(2, 1, stats.name)
+        stats.add(0, np.array([2.0, 4.0]), np.array([1.0, 4.0]))
+        visits, wins = reader.totals()
+        assert list(visits) == [2, 4]
+        assert list(reader.win_rates()) == [0.5, 1.0]
+        reader.close()
+    finally:
+        stats.close()
+
+
+def test_parallel_search_totals():
+    board = GoBoard(4)
+    board.play_move(board.pt(2, 2), BLACK)
+    num_moves = len(GoBoardUtil.generate_legal_moves(board, 2))
+    player = FlatMCSimPlayer(5, board)
+    player.seed(3)
+    seen = []
+
+    def on_update(stats):
+        visits, wins = stats.totals()
+        seen.append((visits.sum(), (wins <= visits).all()))
+
+    move = player.startParallelSimulation(board, "w", 2, on_update=on_update)
+    assert move in GoBoardUtil.generate_legal_moves(board, 2)
+    # each of the 2 workers runs ceil(5 / 2) = 3 playouts per move
+    assert player.playouts == 2 * 3 * num_moves
+    assert seen and seen[-1][0] == player.playouts
+    assert all(ok for total, ok in seen)
+    assert board.get_color(board.pt(2, 2)) == BLACK
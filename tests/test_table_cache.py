@@ -0,0 +1,152 @@
+import json
+import mmap
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import table_cache
+from table_cache import (HEADER, SECTION, build_tables, cache_path, get_table,
+                         read_tables, write_cache, write_tables)
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """ An empty cache directory and no tables loaded yet """
+    monkeypatch.setenv("GOMOKU_TABLE_CACHE", str(tmp_path))
+    monkeypatch.setattr(table_cache, "_tables", {})
+    return tmp_path
+
+
+def test_tables_are_built_in_memory_without_writing(cache):
+    built = build_tables(7)
+    for name in ("rays", "windows", "window_indices", "symmetries"):
+        assert list(get_table(7, name)) == list(built[name])
+    assert not isinstance(get_table(7, "rays").obj, mmap.mmap)
+    assert os.listdir(str(cache)) == []
+
+
+def test_tables_are_mapped_from_the_cache_file(cache):
+    path = write_cache(9)
+    assert path == cache_path(9) and os.path.dirname(path) == str(cache)
+    built = build_tables(9)
+    for name, values in built.items():
+        table = get_table(9, name)
+        assert isinstance(table.obj, mmap.mmap)
+        assert list(table) == list(values)
+    assert os.listdir(str(cache)) == [os.path.basename(path)]
+
+
+def test_rays_are_views_of_the_mapping(cache, monkeypatch):
+    import rule_policy
+    monkeypatch.setattr(rule_policy, "_rays", {})
+    write_cache(7)
+    on_board, rays = rule_policy.get_rays(7)
+    assert rays["E"].shape == (49, 9)
+    assert not rays["E"].flags.writeable
+    assert rays["E"][0, :4].tolist() == [on_board[0] + 1, on_board[0] + 2,
+                                         on_board[0] + 3, on_board[0] + 4]
+    # the border row above, then off the array: point 0, which is BORDER
+    assert rays["N"][0, :3].tolist() == [on_board[0] - 8, 0, 0]
+
+
+def corrupt(path, offset, data):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def section_offset(path, index):
+    return HEADER.size + index * SECTION.size
+
+
+@pytest.mark.parametrize("damage", [
+    "version", "size", "truncated", "appended", "offset", "length", "name", "magic",
+    "windows",
+])
+def test_bad_files_are_ignored(cache, damage):
+    path = write_cache(7)
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, size, count, length = HEADER.unpack_from(data, 0)
+    names = [SECTION.unpack_from(data, section_offset(path, i))[0].rstrip(b"\0")
+             for i in range(count)]
+    rays = names.index(b"rays")
+    name, offset, section_length = SECTION.unpack_from(data, section_offset(path, rays))
+    if damage == "version":
+        corrupt(path, 0, HEADER.pack(magic, version + 1, size, count, length))
+    elif damage == "size":
+        corrupt(path, 0, HEADER.pack(magic, version, 8, count, length))
+    elif damage == "truncated":
+        with open(path, "r+b") as f:
+            f.truncate(length - 4)
+    elif damage == "appended":
+        with open(path, "ab") as f:
+            f.write(b"\0" * 4)
+    elif damage == "offset":
+        corrupt(path, section_offset(path, rays), SECTION.pack(name, length // 4, section_length))
+    elif damage == "length":
+        corrupt(path, section_offset(path, rays), SECTION.pack(name, offset, section_length - 1))
+    elif damage == "name":
+        corrupt(path, section_offset(path, rays), SECTION.pack(b"rayz", offset, section_length))
+    elif damage == "magic":
+        corrupt(path, 0, b"NOTTABLE")
+    elif damage == "windows":
+        tables = build_tables(7)
+        tables["windows"] = tables["windows"][:-1]
+        write_tables(path, 7, tables)
+    assert read_tables(path, 7) is None
+    # the tables are built in memory instead
+    assert list(get_table(7, "rays")) == list(build_tables(7)["rays"])
+    assert not isinstance(get_table(7, "rays").obj, mmap.mmap)
+
+
+def test_size_and_missing_files(cache):
+    path = write_cache(7)
+    assert read_tables(path, 7) is not None
+    assert read_tables(path, 9) is None
+    assert read_tables(str(cache / "missing.bin"), 7) is None
+    empty = cache / "empty.bin"
+    empty.write_bytes(b"")
+    assert read_tables(str(empty), 7) is None
+
+
+READER = """
+import json, sys
+import numpy as np
+from board_util import get_windows
+from rule_policy import get_rays
+from tablebase import get_symmetries
+windows, point_windows = get_windows(7)
+on_board, rays = get_rays(7)
+with open("/proc/self/maps") as f:
+    maps = f.read()
+print(json.dumps({
+    "mapped": sys.argv[1] in maps,
+    "rays": int(sum(int(r.sum()) for r in rays.values())),
+    "windows": [list(w) for w in windows],
+    "symmetries": get_symmetries(7)[1][3][:10],
+}))
+"""
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc")
+def test_two_processes_map_the_same_file(cache):
+    path = write_cache(7)
+    env = dict(os.environ, GOMOKU_TABLE_CACHE=str(cache), PYTHONPATH=SRC)
+    readers = [subprocess.Popen([sys.executable, "-c", READER, path], env=env,
+                                stdout=subprocess.PIPE, universal_newlines=True)
+               for i in range(2)]
+    results = [json.loads(reader.communicate(timeout=60)[0]) for reader in readers]
+    assert all(reader.returncode == 0 for reader in readers)
+    assert results[0]["mapped"] and results[1]["mapped"]
+    assert results[0] == results[1]
+    built = build_tables(7)
+    assert results[0]["rays"] == int(np.array(built["rays"]).sum())
+    assert len(results[0]["windows"]) * 5 == len(built["windows"])
+    # nothing else was written
+    assert os.listdir(str(cache)) == [os.path.basename(path)]
@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from board import GoBoard
+from board_util import BLACK, WHITE
+from tablebase import Tablebase, key_bytes, position_key, solve, solve_game, write_table
+
+
+def transformed(board, transform):
+    """ Copy of board with every stone moved by transform(row, col) """
+    copy = GoBoard(board.size)
+    for row in range(1, board.size + 1):
+        for col in range(1, board.size + 1):
+            color = board.get_color(board.pt(row, col))
+            if color in (BLACK, WHITE):
+                copy.play_move(copy.pt(*transform(row, col)), color)
+    return copy
+
+
+def random_board(size, stones, rng):
+    board = GoBoard(size)
+    points = rng.sample(board.get_empty_points().tolist(), stones)
+    for i, point in enumerate(points):
+        board.play_move(point, BLACK if i % 2 == 0 else WHITE)
+    return board
+
+
+@pytest.mark.parametrize("size", [5, 7, 9])
+def test_key_is_canonical_under_symmetries(size):
+    board = random_board(size, 7, random.Random(size))
+    n = size + 1
+    key = position_key(board, BLACK)
+    for transform in (lambda r, c: (c, n - r), lambda r, c: (n - r, n - c),
+                      lambda r, c: (r, n - c), lambda r, c: (c, r)):
+        assert position_key(transformed(board, transform), BLACK) == key
+    assert position_key(board, WHITE) != key
+
+
+@pytest.mark.parametrize("size", [7, 9, 11])
+def test_keys_do_not_collide(size):
+    board = GoBoard(size)
+    keys = {BLACK: set(), WHITE: set()}
+    for point in board.get_empty_points().tolist():
+        for color in (BLACK, WHITE):
+            board.play_move(point, color)
+            keys[color].add(position_key(board, BLACK))
+            board.undo_move(point)
+    # a lone black stone never has the key of a lone white stone
+    assert not keys[BLACK] & keys[WHITE]
+    # one key per class of points under the symmetries
+    half = (size + 1) // 2
+    assert len(keys[BLACK]) == half * (half + 1) // 2
+
+
+@pytest.mark.parametrize("size", [7, 9, 11])
+def test_full_board_key_fits(size):
+    board = random_board(size, size * size, random.Random(1))
+    key = position_key(board, WHITE)
+    assert key < 1 << (8 * key_bytes(size))
+    key.to_bytes(key_bytes(size), "big")
+
+
+def test_written_table_probes_like_solve(tmp_path):
+    rng = random.Random(2)
+    table = {}
+    board = GoBoard(5)
+    for game in range(5):
+        solve_game(board, [None] * 25, 6, table, rng)
+    assert table
+    path = str(tmp_path / "tb5.bin")
+    write_table(path, 5, 6, table)
+    tb = Tablebase(path)
+    try:
+        assert tb.count == len(table)
+        for key, value in list(table.items())[:200]:
+            assert tb.lookup(key) == value
+        assert tb.lookup(max(table) + 1) is None
+    finally:
+        tb.close()
+
+
+def test_nine_by_nine_table_round_trip(tmp_path):
+    board = random_board(9, 75, random.Random(4))
+    table = {}
+    empty = len(board.get_empty_points())
+    value = solve(board, BLACK if 75 % 2 == 0 else WHITE, table)
+    path = str(tmp_path / "tb9.bin")
+    write_table(path, 9, empty, table)
+    tb = Tablebase(path)
+    try:
+        assert tb.record_size == key_bytes(9) + 1
+        assert tb.probe(board, BLACK if 75 % 2 == 0 else WHITE) == value
+        for key, stored in table.items():
+            assert tb.lookup(key) == stored
+    finally:
+        tb.close()
+
+
+def test_truncated_file_is_rejected(tmp_path):
+    path = tmp_path / "tb.bin"
+    write_table(str(path), 5, 4, {1: 1, 2: -1})
+    path.write_bytes(path.read_bytes()[:-3])
+    with pytest.raises(ValueError):
+        Tablebase(str(path))
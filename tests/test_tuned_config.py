@@ -0,0 +1,58 @@
+import io
+import json
+
+import pytest
+
+from autotune import TunedConfigs, pick_config, read_configs, save_config
+from board import GoBoard
+from gtp_connection import GtpConnection
+from Gomoku3 import FlatMCSimPlayer
+
+CONFIGS = {
+    "7": {"0.5": {"numSimulations": 30, "policy": "rule"},
+          "2.0": {"numSimulations": 120, "policy": "rule"}},
+    "9": {"0.5": {"numSimulations": 15, "policy": "random", "roundSize": 3}},
+}
+
+
+def test_pick_config_by_size_and_time():
+    assert pick_config(CONFIGS, 7, 0.4)["numSimulations"] == 30
+    assert pick_config(CONFIGS, 7, 1.5)["numSimulations"] == 120
+    assert pick_config(CONFIGS, 7)["numSimulations"] == 120
+    assert pick_config(CONFIGS, 11, 0.5) is None
+
+
+def test_config_file_round_trip(tmp_path):
+    path = str(tmp_path / "tuned.json")
+    save_config(path, 9, 0.5, CONFIGS["9"]["0.5"])
+    save_config(path, 7, 0.5, CONFIGS["7"]["0.5"])
+    assert read_configs(path) == {"7": {"0.5": CONFIGS["7"]["0.5"]},
+                                  "9": {"0.5": CONFIGS["9"]["0.5"]}}
+    with open(path, "w") as f:
+        json.dump({"version": 0, "configs": {}}, f)
+    with pytest.raises(ValueError):
+        read_configs(path)
+
+
+def test_overrides_win_over_tuned_values():
+    tuned = TunedConfigs(CONFIGS, 0.5, {"threads": 2, "numSimulations": 5})
+    assert tuned.config(7) == {"numSimulations": 5, "policy": "rule", "threads": 2}
+    assert tuned.config(11) == {"numSimulations": 5, "threads": 2}
+    assert TunedConfigs(**json.loads(json.dumps(tuned.settings()))).config(9) == tuned.config(9)
+
+
+def test_boardsize_applies_the_config_of_the_size():
+    board = GoBoard(7)
+    player = FlatMCSimPlayer(10, board)
+    con = GtpConnection(player, board, out=io.StringIO())
+    con.tuned = TunedConfigs(CONFIGS, 0.5, {"threads": 2})
+    con.apply_tuned_config()
+    assert (player.numSimulations, player.threads, con.policy) == (30, 2, "rulebased")
+    con.get_cmd("boardsize 9")
+    assert (player.numSimulations, player.roundSize, player.threads) == (15, 3, 2)
+    assert con.policy == "random"
+    # sizes without a tuned config fall back to the defaults
+    con.get_cmd("boardsize 11")
+    assert (player.numSimulations, player.roundSize, player.threads) == (10, 1, 2)
+    con.get_cmd("boardsize 7")
+    assert player.numSimulations == 30